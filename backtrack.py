@@ -9,17 +9,26 @@ Solve Sudoku with backtracking
 
 Inspired by code here:
 https://www.geeksforgeeks.org/building-and-visualizing-sudoku-game-using-pygame/
+
+Works for any board of nside x nside with boxes of sqrt(nside) x sqrt(nside),
+e.g. 9x9, 16x16 or 25x25.
 """
 
+from math import isqrt
+
+from limits import CHECK_EVERY
+
 
 def getsquarevals(grid, row, col):
     """
-    Get all the numbers from the 3x3 square including the row and the column
+    Get all the numbers from the square (3x3 for a 9x9 board) including the
+    row and the column
     """
-    irow = row//3
-    icol = col//3
-    return [grid[i][j] for i in range(irow * 3, irow * 3 + 3) \
-            for j in range(icol * 3, icol * 3 + 3)]
+    nbox = isqrt(len(grid))
+    irow = row // nbox * nbox
+    icol = col // nbox * nbox
+    return [grid[i][j] for i in range(irow, irow + nbox) \
+            for j in range(icol, icol + nbox)]
 
 
 def alreadythere(grid, row, col, val):
@@ -36,50 +45,194 @@ def alreadythere(grid, row, col, val):
         return True
 
     # Is the value already in the column?
-    colvals = [grid[i][col] for i in range(9)]
+    colvals = [gridrow[col] for gridrow in grid]
     if val in colvals:
         return True
 
-    # Is the value in the 3x3 square?
+    # Is the value in the square?
     if val in getsquarevals(grid, row, col):
         return True
 
     return False
 
 
-def backtrack(grid, boardRep, row, col):
+def get_occupancy(grid):
     """
-    Solve the sudoku board using ONLY Backtracking
+    Get the values already used in each row, column and box, as bitmasks
+    with bit v-1 set if the value v is used
     @param grid  The current numbers of the Sudoku board, list of lists
-    @param boardRep  The class for printing or plotting the board
-    @param row  Index to row
-    @param col  Index to col
+    @return rows  Bitmask of the values in each row, list
+    @return cols  Bitmask of the values in each column, list
+    @return boxes  Bitmask of the values in each box, list, row by row
+    """
+    nside = len(grid)
+    nbox = isqrt(nside)
+    rows = [0] * nside
+    cols = [0] * nside
+    boxes = [0] * nside
+    for row in range(nside):
+        for col, val in enumerate(grid[row]):
+            if val > 0:
+                bit = 1 << (val - 1)
+                rows[row] |= bit
+                cols[col] |= bit
+                boxes[row // nbox * nbox + col // nbox] |= bit
+    return rows, cols, boxes
+
+
+class Search:
     """
+    Backtracking search, driven by an explicit stack instead of recursion,
+    so the depth is not limited by Python's recursion limit and the search
+    can be stopped and carried on later.
+
+    Each frame on the stack is a list [row, col, box, free, bit] for a cell
+    being tried: free holds the values not yet tried there, as a bitmask,
+    and bit is the value now in the cell (0 if none). Empty cells are taken
+    in the same order, and values lowest first, as by the recursive search,
+    so the same nodes are visited and the same solution is found.
+
+    The search holds no reference to the board representation, so it can
+    be pickled between calls to run, to checkpoint a long solve.
+    """
+    def __init__(self, grid, stats=None, used=None, row=0, col=0):
+        """
+        Set up the search
+        @param grid  The current numbers of the Sudoku board, list of lists;
+                     it is changed in place as the search goes
+        @param stats  SolverStats to count the values tried in, or None
+        @param used  The (rows, cols, boxes) bitmasks from get_occupancy;
+                     by default, built from the grid
+        @param row  Index to the row to start looking for empty cells at
+        @param col  Index to the column to start looking for empty cells at
+        """
+        self.grid = grid
+        self.stats = stats
+        self.used = get_occupancy(grid) if used is None else used
+        self.start = (row, col)
+        self.stack = []
+        self.descend = True         # Move on to the next empty cell
+
+
+    def next_empty(self):
+        """
+        Find the next empty cell, going down each column in turn from the
+        cell of the top frame (or the starting cell)
+        @return  (row, col), or None if every cell is filled
+        """
+        grid = self.grid
+        last = len(grid) - 1
+        row, col = self.stack[-1][:2] if self.stack else self.start
+        while grid[row][col] > 0:
+            if row < last:
+                row += 1
+            elif col < last:
+                row = 0
+                col += 1
+            else:
+                return None
+        return row, col
+
+
+    def run(self, boardRep, max_nodes=None, should_stop=None):
+        """
+        Run the search until it finds a solution, runs out of values to try,
+        or has tried max_nodes values. After a solution, run again to look
+        for the next one.
+        @param boardRep  The class for printing or plotting the board
+        @param max_nodes  Most values to try before pausing; None for no limit
+        @param should_stop  Function called every CHECK_EVERY values tried,
+                            that returns True to pause (e.g. at a deadline);
+                            None to never pause for it
+        @return  'solved', 'failed' or 'paused'
+        """
+        grid = self.grid
+        stats = self.stats
+        rows, cols, boxes = self.used
+        stack = self.stack
+        nside = len(grid)
+        nbox = isqrt(nside)
+        full_mask = (1 << nside) - 1
+        nodes = 0
+        next_check = CHECK_EVERY
+
+        while True:
+            if max_nodes is not None and nodes >= max_nodes:
+                return 'paused'
+            if nodes >= next_check and should_stop is not None:
+                next_check = nodes + CHECK_EVERY
+                if should_stop():
+                    return 'paused'
+
+            if self.descend:
+                cell = self.next_empty()
+                if cell is None:
+                    # Exit condition; backtrack from here if run again
+                    self.descend = False
+                    return 'solved'
+                row, col = cell
+                box = row // nbox * nbox + col // nbox
+                free = full_mask & ~(rows[row] | cols[col] | boxes[box])
+                stack.append([row, col, box, free, 0])
 
-    while grid[row][col] > 0:
-        if row < 8:
-            row += 1
-        elif row == 8 and col < 8:
-            row = 0
-            col += 1
-        elif row == 8 and col == 8:
-            # Exit condition
-            return grid, True
+            if not stack:
+                return 'failed'
+            frame = stack[-1]
+            row, col, box, free, bit = frame
 
-    for testnum in range(1, 10):
-        if not alreadythere(grid, row, col, testnum):
+            if bit:
+                # Back out of the value tried last
+                grid[row][col] = 0
+                rows[row] ^= bit
+                cols[col] ^= bit
+                boxes[box] ^= bit
+                frame[4] = 0
+                boardRep.cell_changed(row, col, 0, 'unassign', grid.copy)
+
+            if not free:
+                stack.pop()
+                self.descend = False
+                continue
+
+            # Try the lowest value left
+            bit = free & -free
+            frame[3] = free ^ bit
+            frame[4] = bit
+            testnum = bit.bit_length()
             grid[row][col] = testnum
+            rows[row] |= bit
+            cols[col] |= bit
+            boxes[box] |= bit
+            nodes += 1
+            if stats is not None:
+                stats.nodes += 1
+            boardRep.cell_changed(row, col, testnum, 'assign', grid.copy)
+            self.descend = True
 
-            boardRep.update(grid, row, col)
-            grid, success = backtrack(grid, boardRep, row, col)
-            if success:
-                # This is the exit condition
-                return grid, True
 
-            grid[row][col] = 0
-            boardRep.update(grid)
 
-    return grid, False
+def backtrack(grid, boardRep, row, col, stats=None, used=None, limits=None):
+    """
+    Solve the sudoku board using ONLY Backtracking
+    @param grid  The current numbers of the Sudoku board, list of lists
+    @param boardRep  The class for printing or plotting the board
+    @param row  Index to row
+    @param col  Index to col
+    @param stats  SolverStats to count the values tried in, or None
+    @param used  The (rows, cols, boxes) bitmasks from get_occupancy, kept
+                 up to date as values are assigned and unassigned; by
+                 default, built from the grid
+    @param limits  limits.Limits for the search, or None for no limits; the
+                   clock must have been started
+    @raises GaveUp  If a limit was reached before the search finished
+    """
+    search = Search(grid, stats, used, row, col)
+    if limits is None:
+        return grid, search.run(boardRep) == 'solved'
+    status = search.run(boardRep, limits.max_nodes, limits.should_stop)
+    if status == 'paused':
+        raise limits.give_up([gridrow[:] for gridrow in grid])
+    return grid, status == 'solved'
 
 
 def quality_check(grid):
@@ -87,8 +240,9 @@ def quality_check(grid):
     Make sure that the board is valid
     @param grid  The current numbers of the Sudoku board, list of lists
     """
-    for row in range(9):
-        for col in range(9):
+    nside = len(grid)
+    for row in range(nside):
+        for col in range(nside):
             val = grid[row][col]
             if val == 0:
                 continue
@@ -98,20 +252,51 @@ def quality_check(grid):
             grid[row][col] = val
 
 
-def backtracker(grid, boardRep):
+def backtracker(grid, boardRep, stats=None, limits=None):
     """
     Solve the sudoku board using ONLY Backtracking
     @param grid  The current numbers of the Sudoku board, list of lists
     @param boardRep  The class for printing or plotting the board
+    @param stats  SolverStats to count the values tried in, or None
+    @param limits  limits.Limits on the time and values tried, or None
+    @raises GaveUp  If a limit was reached before the search finished
     """
+    if limits is not None:
+        limits.start()
 
     # Check the starting grid
     quality_check(grid)
 
-    grid, success = backtrack(grid, boardRep, 0, 0)
+    grid, success = backtrack(grid, boardRep, 0, 0, stats, limits=limits)
 
     # Final test
     if success:
         quality_check(grid)
 
     return grid, success
+
+
+def iter_solutions(grid, boardRep, limit=None, stats=None):
+    """
+    Find the solutions of a sudoku board using ONLY Backtracking, one at a
+    time. The search carries on from where it found the last solution.
+    @param grid  The starting numbers of the Sudoku board, list of lists;
+                 not changed
+    @param boardRep  The class for printing or plotting the board
+    @param limit  Most solutions to find, e.g. 2 to check that there is
+                  only one; None for all of them
+    @param stats  SolverStats to count the values tried in, or None
+    @return  Generator of solved grids, list of lists
+    """
+    if limit is not None and limit < 1:
+        return
+    grid = [gridrow[:] for gridrow in grid]
+    quality_check(grid)
+
+    search = Search(grid, stats)
+    found = 0
+    while search.run(boardRep) == 'solved':
+        yield [gridrow[:] for gridrow in grid]
+        found += 1
+        if found == limit:
+            return
@@ -0,0 +1,408 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 10:25:51 2026
+
+Solve many Sudoku puzzles in one run, with no graphics.
+
+Run from terminal using:
+
+$ python batch.py puzzlefiles --technique backtrack --output results.txt
+                   --width 81
+                   --workers 4 --chunksize 64 --unordered
+                   --inference hidden_singles,naked_pairs
+                   --ordering mrv --values domain --timeout 5 --max-nodes 100000
+
+Where
+- puzzlefiles are files of puzzles, in the .puzz format (blank lines
+  between puzzles) or the one-line format (one puzzle per line); see
+  puzzle_io.py. Files may be gzip-compressed, or binary corpora (see
+  corpus.py). If omitted, or -, puzzles are read from standard input.
+- width is optional: read the files as records of this many characters in
+  the one-line format (e.g. 81), with or without line breaks between them.
+- technique is optional: ac3 (Backtracking + AC-3, the default),
+  backtrack (Backtracking alone), dlx (Dancing Links), or any other
+  engine in the registry (see registry.py).
+- output is optional; by default results go to standard output.
+- workers is optional: the number of processes to solve with; 0 means
+  one per core. With 1, the default, puzzles are solved in this process.
+- chunksize is optional: the number of puzzles sent to a worker at a time.
+- unordered is optional: write results as they finish, instead of in the
+  order of the puzzles.
+- inference is optional: a comma-separated list of inference rules to run
+  along with AC-3 (see inference.py), all, or none. By default, all for
+  16x16 and 25x25 boards and none for the rest. Only for ac3.
+- ordering and values are optional: the heuristics for choosing the next
+  variable and ordering its values, by their names in the registry. Only
+  for ac3.
+- timeout and max-nodes are optional: the most seconds, and values tried,
+  for each puzzle. A puzzle that reaches either is given up on.
+
+With more than one worker, puzzles are sent to the workers in chunks, in
+the one-line format, and only a few chunks per worker are in flight at a
+time, so memory stays bounded however long the input is. Setting the
+cancel event passed to solve_parallel makes the running solves give up at
+their next check and no more chunks are sent, without stopping the worker
+processes; this also happens if the results stop being read.
+
+One tab-separated line is written per puzzle:
+    number  status  solution  milliseconds  nodes
+where status is solved, unsolved, invalid, malformed (the puzzle could not
+be read; the error is written to standard error, and the other puzzles are
+still solved) or gave_up (a limit was reached, or the solve was cancelled),
+and nodes is the number of values the search tried; for gave_up, the
+solution is the board when it stopped.
+"""
+
+import argparse
+import multiprocessing
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from itertools import islice, takewhile
+from os import cpu_count
+from time import perf_counter
+
+from board_plotter import NullBoard                    # No graphics
+from constraints import find_conflict
+from corpus import Corpus, is_corpus
+from inference import RULES
+from limits import GaveUp, Limits
+from puzzle_io import grid_to_line, line_to_grid, open_puzzle_file
+from puzzle_io import read_fixed_width, read_records
+from registry import default_inference, get, get_options, names
+from stats import SolverStats
+
+
+cancel_event = None             # In a worker process, set by init_worker
+
+
+
+def solve_puzzle(grid, technique='ac3', inference=(), ordering=None,
+                 value_ordering=None, limits=None):
+    """
+    Solve one puzzle with no graphics
+    @param grid  The puzzle, list of lists, with zeros for unknown values;
+                 None for a puzzle that could not be read
+    @param technique  'ac3', 'backtrack' or 'dlx'
+    @param inference  Names of inference rules to run along with AC-3, or
+                      None for the default for the size of the board (see
+                      registry.default_inference)
+    @param ordering  Name of the heuristic for the next variable (ac3 only)
+    @param value_ordering  Name of the heuristic for the order of its
+                           values (ac3 only)
+    @param limits  limits.Limits on the time and values tried, or None
+    @return status  'solved', 'unsolved', 'invalid', 'malformed' or
+                    'gave_up'
+    @return grid  The solved grid (or the last grid, if not solved)
+    @return seconds  Time taken to solve
+    @return stats  SolverStats for the solve, up to where it stopped
+    @raises ValueError  If inference or a heuristic is given for an engine
+                        other than ac3
+    """
+    if grid is None:
+        return 'malformed', [], 0.0, SolverStats()
+    if inference is None:
+        inference = default_inference(len(grid)) if technique == 'ac3' else ()
+    solver = get('engine', technique)
+    options = get_options(technique, ordering, value_ordering, inference)
+    if limits is not None:
+        options['limits'] = limits
+    stats = SolverStats()
+    start = perf_counter()
+    if find_conflict(grid) is not None:
+        # .. The starting board has duplicates; checked here so every
+        #    engine reports it the same way
+        return 'invalid', grid, perf_counter() - start, stats
+    try:
+        grid, success = solver(grid, NullBoard(), stats=stats, **options)
+        status = 'solved' if success else 'unsolved'
+    except GaveUp as exc:
+        status = 'gave_up'
+        grid = exc.grid
+    seconds = perf_counter() - start
+
+    return status, grid, seconds, stats
+
+
+
+def format_result(number, status, grid, seconds, stats):
+    """
+    Get the result line for a puzzle
+    @param number  Number of the puzzle in the input, from 1
+    @param status  'solved', 'unsolved', 'invalid', 'malformed' or
+                   'gave_up'
+    @param grid  The solved grid
+    @param seconds  Time taken to solve
+    @param stats  SolverStats for the solve
+    @return  The tab-separated result line, without a newline
+    """
+    return '\t'.join([str(number), status, grid_to_line(grid),
+                      '%.3f' % (seconds * 1000), str(stats.nodes)])
+
+
+
+def solve_all(puzzles, technique='ac3', inference=(), ordering=None,
+              value_ordering=None, limits=None):
+    """
+    Solve puzzles one after another
+    @param puzzles  Iterable of grids; None for a puzzle that could not be
+                    read
+    @param technique  'ac3', 'backtrack' or 'dlx'
+    @param inference  Names of inference rules to run along with AC-3, or
+                      None for the default for the size of each board
+    @param ordering  Name of the heuristic for the next variable (ac3 only)
+    @param value_ordering  Name of the heuristic for the order of its values
+    @param limits  limits.Limits for each puzzle, or None for no limits
+    @return  Generator of result lines, in the order of the puzzles
+    """
+    for number, grid in enumerate(puzzles, 1):
+        yield format_result(number, *solve_puzzle(grid, technique, inference,
+                                                  ordering, value_ordering,
+                                                  limits))
+
+
+
+def init_worker(cancel):
+    """
+    Set up a worker process
+    @param cancel  multiprocessing.Event that cancels the solves when set;
+                   it can only be shared when the process is started
+    """
+    global cancel_event
+    cancel_event = cancel
+
+
+
+def solve_chunk(chunk, technique='ac3', inference=(), ordering=None,
+                value_ordering=None, seconds=None, max_nodes=None):
+    """
+    Solve a chunk of puzzles; this is what runs in the worker processes
+    @param chunk  List of (number, puzzle), with the puzzle in the one-line
+                  format, or empty if it could not be read
+    @param technique  'ac3', 'backtrack' or 'dlx'
+    @param inference  Names of inference rules to run along with AC-3, or
+                      None for the default for the size of each board
+    @param ordering  Name of the heuristic for the next variable (ac3 only)
+    @param value_ordering  Name of the heuristic for the order of its values
+    @param seconds  Most time for each puzzle; None for no limit
+    @param max_nodes  Most values to try for each puzzle; None for no limit
+    @return  List of result lines, in the order of the chunk
+    """
+    limits = None
+    if seconds is not None or max_nodes is not None \
+      or cancel_event is not None:
+        limits = Limits(seconds, max_nodes, cancel_event)
+    return [format_result(number, *solve_puzzle(line_to_grid(line) if line
+                                                else None, technique,
+                                                inference, ordering,
+                                                value_ordering, limits))
+            for number, line in chunk]
+
+
+
+def get_chunks(puzzles, chunksize):
+    """
+    Split puzzles into chunks, without reading ahead of the current chunk
+    @param puzzles  Iterable of grids, or None for a puzzle that could not
+                    be read
+    @param chunksize  Maximum number of puzzles per chunk
+    @return  Generator of lists of (number, puzzle in the one-line format,
+             or '' for None)
+    """
+    numbered = ((number, grid_to_line(grid) if grid is not None else '')
+                for number, grid in enumerate(puzzles, 1))
+    while True:
+        chunk = list(islice(numbered, chunksize))
+        if not chunk:
+            return
+        yield chunk
+
+
+
+def solve_parallel(puzzles, technique='ac3', workers=None, chunksize=64,
+                   ordered=True, inference=(), ordering=None,
+                   value_ordering=None, seconds=None, max_nodes=None,
+                   cancel=None):
+    """
+    Solve puzzles in a pool of worker processes
+    @param puzzles  Iterable of grids, or None for a puzzle that could not
+                    be read; read as chunks are sent out
+    @param technique  'ac3', 'backtrack' or 'dlx'
+    @param workers  Number of processes; default one per core
+    @param chunksize  Number of puzzles sent to a worker at a time
+    @param ordered  If True, results come in the order of the puzzles;
+                    otherwise, as each chunk finishes
+    @param inference  Names of inference rules to run along with AC-3, or
+                      None for the default for the size of each board
+    @param ordering  Name of the heuristic for the next variable (ac3 only)
+    @param value_ordering  Name of the heuristic for the order of its values
+    @param seconds  Most time for each puzzle; None for no limit
+    @param max_nodes  Most values to try for each puzzle; None for no limit
+    @param cancel  multiprocessing.Event; when it is set, the running solves
+                   give up and no more chunks are sent. By default one is
+                   made, and set if the results stop being read early.
+    @return  Generator of result lines
+    """
+    workers = workers or cpu_count() or 1
+    max_pending = 2 * workers             # Chunks in flight at a time
+    options = (technique, inference, ordering, value_ordering, seconds,
+               max_nodes)
+    if cancel is None:
+        cancel = multiprocessing.Event()
+    # .. Stop reading the input as soon as the run is cancelled
+    chunks = takewhile(lambda chunk: not cancel.is_set(),
+                       get_chunks(puzzles, chunksize))
+
+    with ProcessPoolExecutor(workers, initializer=init_worker,
+                             initargs=(cancel,)) as pool:
+        try:
+            if ordered:
+                pending = deque()
+                for chunk in chunks:
+                    pending.append(pool.submit(solve_chunk, chunk, *options))
+                    if len(pending) >= max_pending:
+                        yield from pending.popleft().result()
+                while pending:
+                    yield from pending.popleft().result()
+            else:
+                pending = set()
+                for chunk in chunks:
+                    pending.add(pool.submit(solve_chunk, chunk, *options))
+                    if len(pending) >= max_pending:
+                        done, pending = wait(pending,
+                                             return_when=FIRST_COMPLETED)
+                        for future in done:
+                            yield from future.result()
+                while pending:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield from future.result()
+        except BaseException:
+            # .. Closed early or failed: drop the chunks not started, and
+            #    stop the running solves, so the pool does not wait for them
+            cancel.set()
+            for future in pending:
+                future.cancel()
+            raise
+
+
+
+def read_files(filenames, width=None, errors=None):
+    """
+    Read puzzles from files, one file after another, a puzzle at a time.
+    A puzzle that cannot be read is reported, and does not stop the rest.
+    @param filenames  List of file names; - means standard input. Files
+                      compressed with gzip are read as if they were not,
+                      and binary corpora (corpus.py) are memory-mapped.
+    @param width  Read records of this many characters in the one-line
+                  format (see puzzle_io.read_fixed_width); None for lines
+    @param errors  File to report the puzzles that cannot be read to;
+                   default standard error
+    @return  Generator of grids, or None for a puzzle that cannot be read
+    """
+    errors = errors or sys.stderr
+    def read(puzzlefile):
+        """Read the records of one file"""
+        if width is None:
+            return read_records(puzzlefile)
+        return read_fixed_width(puzzlefile, width)
+
+    for filename in filenames:
+        if filename != '-' and is_corpus(filename):
+            with Corpus(filename) as corpus:
+                yield from corpus
+            continue
+        if filename == '-':
+            records = read(sys.stdin)
+        else:
+            puzzlefile = open_puzzle_file(filename)
+            records = read(puzzlefile)
+        try:
+            for record in records:
+                if record.error is not None:
+                    errors.write('%s: %s\n' % (filename, record.error))
+                yield record.grid
+        finally:
+            if filename != '-':
+                puzzlefile.close()
+
+
+
+def main(argv=None):
+    """
+    Run the batch solver
+    @param argv  Command-line arguments; default sys.argv[1:]
+    """
+    parser = argparse.ArgumentParser(description='Solve Sudoku puzzles '
+                                     'in bulk, with no graphics.')
+    parser.add_argument('puzzlefiles', nargs='*', default=['-'],
+                        help='puzzle files; - for standard input')
+    parser.add_argument('--technique', choices=names('engine'),
+                        default='ac3')
+    parser.add_argument('--output', default='-',
+                        help='file for the results; - for standard output')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='number of processes; 0 for one per core')
+    parser.add_argument('--chunksize', type=int, default=64,
+                        help='puzzles sent to a worker at a time')
+    parser.add_argument('--unordered', action='store_true',
+                        help='write results as they finish')
+    parser.add_argument('--inference',
+                        help='comma-separated inference rules, all or none; '
+                        'default all for 16x16 and larger boards, otherwise '
+                        'none: ' + ', '.join(RULES))
+    parser.add_argument('--ordering', choices=names('ordering'),
+                        help='heuristic for the next variable (ac3 only)')
+    parser.add_argument('--values', choices=names('value_ordering'),
+                        help='heuristic for the order of its values '
+                        '(ac3 only)')
+    parser.add_argument('--width', type=int,
+                        help='read fixed-width records of this many '
+                        'characters, e.g. 81')
+    parser.add_argument('--timeout', type=float,
+                        help='most seconds for each puzzle')
+    parser.add_argument('--max-nodes', type=int,
+                        help='most values to try for each puzzle')
+    args = parser.parse_args(argv)
+
+    if args.inference is None:
+        inference = None                    # By the size of each board
+    elif args.inference == 'all':
+        inference = tuple(RULES)
+    elif args.inference == 'none':
+        inference = ()
+    else:
+        inference = tuple(rule for rule in args.inference.split(',') if rule)
+    for rule in inference or ():
+        if rule not in RULES:
+            parser.error('unknown inference rule: ' + rule)
+    technique = args.technique
+    if (inference or args.ordering or args.values) and technique != 'ac3':
+        parser.error('--inference, --ordering and --values only apply to '
+                     'ac3')
+
+    puzzles = read_files(args.puzzlefiles, args.width)
+    if args.workers == 1:
+        limits = None
+        if args.timeout is not None or args.max_nodes is not None:
+            limits = Limits(args.timeout, args.max_nodes)
+        results = solve_all(puzzles, technique, inference,
+                            args.ordering, args.values, limits)
+    else:
+        results = solve_parallel(puzzles, technique, args.workers,
+                                 args.chunksize, not args.unordered,
+                                 inference, args.ordering, args.values,
+                                 args.timeout, args.max_nodes)
+    if args.output == '-':
+        for line in results:
+            print(line)
+    else:
+        with open(args.output, 'w') as outfile:
+            for line in results:
+                outfile.write(line + '\n')
+
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 16:42:09 2026
+
+Benchmark the solvers: every engine and variable-ordering heuristic on the
+same puzzles, with no graphics.
+
+Run from terminal using:
+
+$ python benchmark.py puzzlefiles --configs ac3,dlx --generate 200
+                      --level hard --seed 0 --repeat 3 --output results.json
+                      --baseline baseline.json --threshold 0.1
+
+Where
+- puzzlefiles are optional files of puzzles (see puzzle_io.py), which may
+  be gzip-compressed, or binary corpora (see corpus.py); by default, the
+  bundled puzzles/*.puzz.
+- configs is optional: a comma-separated list of the configurations in
+  CONFIGS to run; by default all of them.
+- generate is optional: also run on this many puzzles from generator.py,
+  at the level and seed given (default medium, 0).
+- repeat is optional: time each puzzle this many times and keep the
+  fastest, and the slowest for comparing with later runs (default 5).
+  Timings on a busy machine vary by 20% or more between runs, so fewer
+  repeats make the comparison with a baseline unreliable.
+- no-memory skips measuring peak memory, which needs another run of each
+  puzzle with tracemalloc on (tracing slows the solvers, so the times are
+  taken without it).
+- output is optional: a JSON file for the results.
+- baseline is optional: a JSON file from an earlier run to compare with.
+  Regressions are printed and the exit status is 1 if there are any.
+- threshold is optional: how much slower (0.1 is 10%) a time or memory
+  figure may be before it counts as a regression. A time only counts if
+  the fastest of this run's repeats is that much slower than the slowest
+  of the baseline's, and by more than MIN_MS, so noise between runs does
+  not fail the comparison. Counts of nodes and revisions do not depend on
+  the machine, so any increase is a regression.
+
+For each configuration the summary has the number of puzzles solved, the
+50th, 95th and 99th percentile and total time per puzzle, the time in the
+first AC-3 and in the search (for the ac3 configurations), the values the
+search tried (nodes), the AC-3 arcs that removed a value (revisions) and
+the largest peak memory for a puzzle.
+"""
+
+import argparse
+import json
+import platform
+import sys
+import tracemalloc
+from glob import glob
+from os.path import dirname, join
+from time import perf_counter
+
+from board_plotter import NullBoard                    # No graphics
+from constraints import find_conflict
+from corpus import Corpus, is_corpus
+from generator import LEVEL_NAMES, generate
+from inference import RULES
+from puzzle_io import open_puzzle_file, read_puzzles, line_to_grid
+from registry import get
+from stats import SolverStats
+
+
+# Name: (engine, keyword arguments), with the engines and heuristics named
+# as in the registry (see registry.py)
+CONFIGS = {
+    'ac3': ('ac3', {'select': 'mrv_degree'}),
+    'ac3-mrv': ('ac3', {'select': 'mrv'}),
+    'ac3-next': ('ac3', {'select': 'next'}),
+    'ac3-ascending': ('ac3', {'order': 'ascending'}),
+    'ac3-lcv': ('ac3', {'order': 'lcv'}),
+    'ac3-lcv-copy': ('ac3', {'order': 'lcv', 'use_trail': False}),
+    'ac3-copy': ('ac3', {'use_trail': False}),
+    'ac3-inference': ('ac3', {'inference': tuple(RULES)}),
+    'backtrack': ('backtrack', {}),
+    'dlx': ('dlx', {}),
+    }
+
+TIME_METRICS = ('p50_ms', 'p95_ms', 'p99_ms', 'total_ms', 'peak_kb')
+COUNT_METRICS = ('nodes', 'revisions')
+MIN_MS = 1.0        # Time differences smaller than this are never flagged
+SLOWEST_METRICS = ('p50_ms', 'p95_ms', 'p99_ms', 'total_ms')
+
+
+
+def percentile(values, percent):
+    """
+    Get a percentile, by the nearest-rank method
+    @param values  List of numbers
+    @param percent  The percentile, 0...100
+    @return  The smallest value that is at least percent % of the values
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = -(-percent * len(ordered) // 100)          # Rounded up
+    return ordered[max(rank, 1) - 1]
+
+
+
+def run_puzzle(config, grid, repeat=5, memory=True):
+    """
+    Solve one puzzle with one configuration
+    @param config  Name of the configuration, in CONFIGS
+    @param grid  The puzzle, list of lists, with zeros for unknown values;
+                 not changed
+    @param repeat  Times to solve it; the fastest and slowest times are kept
+    @param memory  If True, solve it once more with tracemalloc on, for the
+                   peak memory
+    @return  Dictionary of the results
+    """
+    engine, options = CONFIGS[config]
+    solver = get('engine', engine)
+    if find_conflict(grid) is not None:
+        # .. The starting board has duplicates; not timed, for any engine
+        result = {'status': 'invalid', 'ms': 0.0, 'max_ms': 0.0,
+                  'propagation_ms': 0.0, 'search_ms': 0.0, 'nodes': 0,
+                  'revisions': 0}
+        if memory:
+            result['peak_kb'] = 0.0
+        return result
+
+    seconds = slowest = None
+    for irepeat in range(repeat):
+        stats = SolverStats()
+        start = perf_counter()
+        solution, success = solver([row[:] for row in grid], NullBoard(),
+                                   stats=stats, **options)
+        status = 'solved' if success else 'unsolved'
+        elapsed = perf_counter() - start
+        if seconds is None or elapsed < seconds:
+            seconds = elapsed
+        if slowest is None or elapsed > slowest:
+            slowest = elapsed
+
+    result = {'status': status,
+              'ms': seconds * 1000,
+              'max_ms': slowest * 1000,
+              'propagation_ms': stats.propagation_seconds * 1000,
+              'search_ms': stats.search_seconds * 1000,
+              'nodes': stats.nodes,
+              'revisions': stats.revisions}
+
+    if memory:
+        tracemalloc.start()
+        solver([row[:] for row in grid], NullBoard(), **options)
+        result['peak_kb'] = tracemalloc.get_traced_memory()[1] / 1024
+        tracemalloc.stop()
+    return result
+
+
+
+def summarize(results):
+    """
+    Summarize the results for one configuration
+    @param results  List of dictionaries from run_puzzle
+    @return  Dictionary of the summary
+    """
+    times = [result['ms'] for result in results]
+    slowest = [result['max_ms'] for result in results]
+    summary = {'puzzles': len(results),
+               'solved': sum(result['status'] == 'solved'
+                             for result in results),
+               'p50_ms': percentile(times, 50),
+               'p95_ms': percentile(times, 95),
+               'p99_ms': percentile(times, 99),
+               'total_ms': sum(times),
+               'propagation_ms': sum(result['propagation_ms']
+                                     for result in results),
+               'search_ms': sum(result['search_ms'] for result in results),
+               'nodes': sum(result['nodes'] for result in results),
+               'revisions': sum(result['revisions'] for result in results),
+               'slowest': {'p50_ms': percentile(slowest, 50),
+                           'p95_ms': percentile(slowest, 95),
+                           'p99_ms': percentile(slowest, 99),
+                           'total_ms': sum(slowest)}}
+    if results and 'peak_kb' in results[0]:
+        summary['peak_kb'] = max(result['peak_kb'] for result in results)
+    return summary
+
+
+
+def run_benchmark(puzzles, configs=None, repeat=5, memory=True):
+    """
+    Run every configuration on every puzzle
+    @param puzzles  List of (name, grid)
+    @param configs  Names of the configurations to run; default all
+    @param repeat  Times to solve each puzzle; the fastest and slowest times
+                   are kept
+    @param memory  If True, also measure the peak memory for each puzzle
+    @return  Dictionary of the results, ready to be written as JSON
+    """
+    report = {'python': platform.python_version(),
+              'platform': platform.platform(),
+              'repeat': repeat,
+              'configs': {}}
+    for config in configs or CONFIGS:
+        # .. Warm up, so building the cached tables is not timed
+        if puzzles:
+            run_puzzle(config, puzzles[0][1], memory=False)
+
+        results = []
+        for name, grid in puzzles:
+            result = run_puzzle(config, grid, repeat, memory)
+            result['puzzle'] = name
+            results.append(result)
+        report['configs'][config] = {'summary': summarize(results),
+                                     'puzzles': results}
+    return report
+
+
+
+def compare(baseline, report, threshold=0.1):
+    """
+    Find the regressions from a baseline
+    @param baseline  Results of an earlier run_benchmark
+    @param report  Results of this run_benchmark
+    @param threshold  Fraction by which a time or memory figure may grow.
+                      Times are compared fastest against the baseline's
+                      slowest, over the repeats of each puzzle
+    @return  List of messages, one for each regression
+    """
+    regressions = []
+    for config, results in report['configs'].items():
+        if config not in baseline['configs']:
+            continue
+        old = baseline['configs'][config]['summary']
+        new = results['summary']
+        if old['puzzles'] != new['puzzles']:
+            regressions.append('%s: %d puzzles, but %d in the baseline; '
+                               'not compared' % (config, new['puzzles'],
+                                                 old['puzzles']))
+            continue
+        if new['solved'] < old['solved']:
+            regressions.append('%s: solved %d, down from %d'
+                               % (config, new['solved'], old['solved']))
+        for metric in TIME_METRICS:
+            if metric not in old or metric not in new:
+                continue
+            limit = old.get('slowest', {}).get(metric, old[metric])
+            if new[metric] > limit * (1 + threshold) \
+              and new[metric] - limit > MIN_MS:
+                regressions.append('%s: %s %.3f, up from %.3f'
+                                   % (config, metric, new[metric], limit))
+        for metric in COUNT_METRICS:
+            if new[metric] > old[metric]:
+                regressions.append('%s: %s %d, up from %d'
+                                   % (config, metric, new[metric],
+                                      old[metric]))
+    return regressions
+
+
+
+def format_report(report):
+    """
+    Get a table of the summaries
+    @param report  Results of run_benchmark
+    @return  The table, as a string
+    """
+    header = ('config', 'puzzles', 'solved', 'p50 ms', 'p95 ms', 'p99 ms',
+              'total ms', 'nodes', 'revisions', 'peak KB')
+    lines = ['%-14s %7s %7s %9s %9s %9s %10s %9s %10s %9s' % header]
+    for config, results in report['configs'].items():
+        summary = results['summary']
+        lines.append('%-14s %7d %7d %9.3f %9.3f %9.3f %10.3f %9d %10d %9s'
+                     % (config, summary['puzzles'], summary['solved'],
+                        summary['p50_ms'], summary['p95_ms'],
+                        summary['p99_ms'], summary['total_ms'],
+                        summary['nodes'], summary['revisions'],
+                        '%.1f' % summary['peak_kb'] if 'peak_kb' in summary
+                        else '-'))
+    return '\n'.join(lines)
+
+
+
+def load_puzzles(filenames):
+    """
+    Read the puzzles to benchmark
+    @param filenames  Puzzle files; by default the bundled puzzles/*.puzz
+    @return  List of (name, grid), where the name is the file name, and the
+             number of the puzzle in it if there is more than one
+    """
+    if not filenames:
+        filenames = sorted(glob(join(dirname(__file__) or '.', 'puzzles',
+                                     '*.puzz')))
+    puzzles = []
+    for filename in filenames:
+        if is_corpus(filename):
+            with Corpus(filename) as corpus:
+                grids = corpus[:]
+        else:
+            with open_puzzle_file(filename) as puzzlefile:
+                grids = list(read_puzzles(puzzlefile))
+        for number, grid in enumerate(grids, 1):
+            name = filename if len(grids) == 1 else '%s#%d' % (filename,
+                                                              number)
+            puzzles.append((name, grid))
+    return puzzles
+
+
+
+def main(argv=None):
+    """
+    Run the benchmark
+    @param argv  Command-line arguments; default sys.argv[1:]
+    @return  Exit status: 1 if there are regressions from the baseline
+    """
+    parser = argparse.ArgumentParser(description='Benchmark the Sudoku '
+                                     'solvers.')
+    parser.add_argument('puzzlefiles', nargs='*',
+                        help='puzzle files; default puzzles/*.puzz')
+    parser.add_argument('--configs', default='',
+                        help='comma-separated configurations: '
+                        + ', '.join(CONFIGS))
+    parser.add_argument('--generate', type=int, default=0,
+                        help='number of generated puzzles to add')
+    parser.add_argument('--level', choices=LEVEL_NAMES, default='medium',
+                        help='level of the generated puzzles')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='seed for the generated puzzles')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='processes for generating puzzles; 0 for one '
+                        'per core')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='times to solve each puzzle; default 5')
+    parser.add_argument('--no-memory', action='store_true',
+                        help='do not measure peak memory')
+    parser.add_argument('--output', help='JSON file for the results')
+    parser.add_argument('--baseline', help='JSON file to compare with')
+    parser.add_argument('--threshold', type=float, default=0.1)
+    args = parser.parse_args(argv)
+
+    configs = [config for config in args.configs.split(',') if config]
+    for config in configs:
+        if config not in CONFIGS:
+            parser.error('unknown configuration: ' + config)
+
+    puzzles = load_puzzles(args.puzzlefiles)
+    if args.generate:
+        for number, line in enumerate(generate(args.generate, args.level,
+                                               args.seed, args.workers), 1):
+            puzzles.append(('generated-%s-%d#%d' % (args.level, args.seed,
+                                                    number),
+                            line_to_grid(line)))
+
+    report = run_benchmark(puzzles, configs, args.repeat, not args.no_memory)
+    print(format_report(report))
+    if args.output:
+        with open(args.output, 'w') as outfile:
+            json.dump(report, outfile, indent=1)
+
+    if args.baseline:
+        with open(args.baseline) as infile:
+            baseline = json.load(infile)
+        regressions = compare(baseline, report, args.threshold)
+        for message in regressions:
+            print('Regression:', message)
+        if regressions:
+            return 1
+    return 0
+
+
+
+if __name__ == '__main__':
+    sys.exit(main())
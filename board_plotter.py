@@ -8,19 +8,46 @@ Created on Sun Jan 23 16:16:21 2022
 A class for displaying the Sudoko board
 
 by Penny Rowe
+
+matplotlib is only imported when a BoardPlot is created, so headless runs
+(NullBoard, BoardPrint) never pay for it.
 """
 
 from abc import abstractmethod
-import numpy as np
-import matplotlib.pyplot as plt
-from matplotlib.ticker import AutoMinorLocator
+from math import isqrt
+
+plt = None                              # matplotlib.pyplot, once imported
 
 
 class BoardRepresentation():
     """Informal interface for classes that create a board representation,
     e.g. by printing to standard output or plotting the sudoku board
-    These are the methods that must be included in the subclasses"""
-    
+    These are the methods that must be included in the subclasses
+
+    The solvers report each change to the board by calling cell_changed
+    with the cell, its new value and the kind of change:
+        'assign'     The search tried a value in the cell
+        'unassign'   The search backed out of the value (new value 0)
+        'propagate'  Propagation left only one value for the cell
+    along with a function that returns the current grid. The grid is only
+    built if that function is called, so a subscriber that does not need
+    it, like NullBoard, costs nothing."""
+
+    def cell_changed(self, row, col, value, kind, get_grid):
+        """
+        Observe a change to the board. By default, build the grid and pass
+        it to update, with the position of the change for an assignment.
+        @param row  Index to row of the cell that changed
+        @param col  Index to column of the cell that changed
+        @param value  The new value of the cell, 0 if unassigned
+        @param kind  'assign', 'unassign' or 'propagate'
+        @param get_grid  Function that returns the current grid, list of lists
+        """
+        if kind == 'assign':
+            self.update(get_grid(), row, col)
+        else:
+            self.update(get_grid())
+
     @abstractmethod
     def __init__(self, grid, techinque):
         """
@@ -55,6 +82,28 @@ class BoardRepresentation():
 
 
 
+class NullBoard(BoardRepresentation):
+    """A board representation that ignores every change; for headless runs"""
+    def __init__(self, grid=None, techinque=''):
+        """
+        Set up the class; nothing is displayed
+        @param grid  The current values in the board, list of lists (unused)
+        """
+
+    def cell_changed(self, row, col, value, kind, get_grid):
+        """Ignore the change; the grid is never built"""
+
+    def update(self, grid, xpos=-1, ypos=-1):
+        """Ignore the new grid"""
+
+    def message(self, msg):
+        """Ignore the message"""
+
+    def finish(self, success):
+        """Nothing to wrap up"""
+
+
+
 class BoardPrint(BoardRepresentation):
     """A class for printing the Sudoko board to standard output as it changes"""
     def __init__(self, grid, techinque):
@@ -101,14 +150,18 @@ class BoardPlot(BoardRepresentation):
         Plot the starting sudoku board and set up the class
         @param grid  The current values in the board, list of lists
         """
+        global plt
+        import matplotlib.pyplot as plt
+        from matplotlib.ticker import AutoMinorLocator
 
         # Create subplots
         fig, ax = plt.subplots(figsize=(5, 4.5))
         self.ax = ax
         self.fig = fig
-        self.fsize = 18
-        self.nrow, self.ncol = np.shape(grid)
+        self.nrow, self.ncol = len(grid), len(grid[0])
+        self.fsize = 18 * 9 // self.nrow       # 18 for a 9x9 board
         self.txt = []
+        nbox = isqrt(self.nrow)                 # Side of a box: 3 for 9x9
 
         # Interactive mode
         plt.ion()
@@ -123,14 +176,14 @@ class BoardPlot(BoardRepresentation):
         for axis in ['top', 'bottom', 'left', 'right']:
             ax.spines[axis].set_linewidth(2.5)
 
-        minor_locator = AutoMinorLocator(3)
+        minor_locator = AutoMinorLocator(nbox)
         ax.xaxis.set_minor_locator(minor_locator)
-        minor_locator = AutoMinorLocator(3)
+        minor_locator = AutoMinorLocator(nbox)
         ax.yaxis.set_minor_locator(minor_locator)
         plt.grid(which='minor')
 
-        ax.set_xticks([-.5, 2.5, 5.5])
-        ax.set_yticks([-.5, 2.5, 5.5])
+        ax.set_xticks([ibox * nbox - .5 for ibox in range(nbox)])
+        ax.set_yticks([ibox * nbox - .5 for ibox in range(nbox)])
         ax.set(xticklabels=[])
         ax.set(yticklabels=[])
         ax.tick_params(axis='y', which='both', direction='in')
@@ -141,6 +194,8 @@ class BoardPlot(BoardRepresentation):
 
         if technique == 'backtrack':
             plt.title('Sudoku solver with ' + technique, fontsize=12)
+        elif technique == 'dlx':
+            plt.title('Sudoku solver with Dancing Links', fontsize=12)
         else:
             plt.title('Sudoku solver with Backtracking + AC-3', fontsize=12)
 
@@ -168,8 +223,8 @@ class BoardPlot(BoardRepresentation):
         """The column corresponds to the x-value, the
                         # row to the y-value
         """
-        xloc = col - .25
-        yloc = 7.75 - row
+        xloc = col - .25 * len(str(num))
+        yloc = self.nrow - 1.25 - row
         self.txt.append(self.ax.text(xloc, yloc, str(num), fontsize=self.fsize,
                                      color=color))
 
@@ -244,3 +299,10 @@ class BoardPlot(BoardRepresentation):
             msg = 'Success!'
             self.message(msg)
         plt.pause(10)
+
+
+
+# Board representations by name, for the registry (see registry.py)
+SINKS = {'plot': BoardPlot,
+         'print': BoardPrint,
+         'null': NullBoard}
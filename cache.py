@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 18:55:26 2026
+
+A cache of solutions in front of solver.solve.
+
+Many puzzles are the same puzzle in disguise: the digits relabelled, rows
+swapped within a band (or whole bands swapped), columns swapped within a
+stack (or whole stacks swapped), or the board transposed. Each of these
+turns a solution of one into a solution of the other. So the cache keys a
+puzzle by a canonical form: the rows, columns and digits are coloured by
+what is given in them (see get_order), the bands and rows, and stacks and
+columns, are sorted by colour, the digits are renumbered in the order they
+first appear, and the smaller of this and the same for the transposed
+board is taken. The solution is stored in the canonical form too, and is
+mapped back through the same transformation for each puzzle that hits it.
+
+Equivalent puzzles whose rows or columns still tie on colour may get
+different canonical forms; that only costs a miss, never a wrong answer,
+since the key is the transformed puzzle itself. An exact key (the puzzle
+as given) is checked first, so repeats of the same puzzle do not even need
+the canonical form, which costs a millisecond or two.
+
+For puzzles with more than one solution, the cache returns whichever
+solution was found first, whatever options were used to find it.
+"""
+
+import dbm
+from collections import OrderedDict, namedtuple
+from math import isqrt
+
+from board_plotter import NullBoard
+from puzzle_io import grid_to_line, line_to_grid
+from solver import solve
+
+
+CacheInfo = namedtuple('CacheInfo', 'hits misses maxsize currsize')
+
+NO_SOLUTION = ''        # Stored for a puzzle that cannot be solved
+REFINE_ROUNDS = 3       # Rounds of colour refinement in get_order
+
+
+
+def transpose(grid):
+    """
+    Get the transpose of a grid
+    @param grid  List of lists
+    @return  The transposed grid, list of lists
+    """
+    return [list(col) for col in zip(*grid)]
+
+
+
+def rank(signatures):
+    """
+    Replace signatures by small ints that sort in the same order
+    @param signatures  List of comparable signatures
+    @return  List of ints, equal for equal signatures
+    """
+    ranks = {sig: i for i, sig in enumerate(sorted(set(signatures)))}
+    return [ranks[sig] for sig in signatures]
+
+
+
+def get_order(grid, rounds=REFINE_ROUNDS):
+    """
+    Order the rows and columns of a grid by what is given in them, in a
+    way that does not depend on how the puzzle was disguised. Each row,
+    column and digit gets a colour, refined over a few rounds from the
+    colours of the rows, columns and digits of its clues (like colour
+    refinement for graph isomorphism). The bands are then sorted by the
+    colours of their rows, and the rows within each band by colour; the
+    same for the stacks and columns. Ties are left in their first order.
+    @param grid  The puzzle, list of lists, with zeros for unknown values
+    @param rounds  Number of rounds of refinement
+    @return rows  List of row indices, in the new order
+    @return cols  List of column indices, in the new order
+    """
+    nside = len(grid)
+    nbox = isqrt(nside)
+    clues = [(irow, icol, val) for irow, row in enumerate(grid)
+             for icol, val in enumerate(row) if val]
+    row_colour = [0] * nside
+    col_colour = [0] * nside
+    val_colour = [0] * (nside + 1)
+
+    for iround in range(rounds):
+        band_colour = [tuple(sorted(row_colour[iband:iband + nbox]))
+                       for iband in range(0, nside, nbox)]
+        stack_colour = [tuple(sorted(col_colour[istack:istack + nbox]))
+                        for istack in range(0, nside, nbox)]
+
+        # .. What each row sees in each stack, and each column in each band
+        row_seen = [[[] for istack in range(nbox)] for irow in range(nside)]
+        col_seen = [[[] for iband in range(nbox)] for icol in range(nside)]
+        val_seen = [[] for val in range(nside + 1)]
+        for irow, icol, val in clues:
+            row_seen[irow][icol // nbox].append((col_colour[icol],
+                                                 val_colour[val]))
+            col_seen[icol][irow // nbox].append((row_colour[irow],
+                                                 val_colour[val]))
+            val_seen[val].append((row_colour[irow], col_colour[icol]))
+
+        row_colour = rank([(row_colour[irow], band_colour[irow // nbox],
+                            tuple(sorted(tuple(sorted(seen))
+                                         for seen in row_seen[irow])))
+                           for irow in range(nside)])
+        col_colour = rank([(col_colour[icol], stack_colour[icol // nbox],
+                            tuple(sorted(tuple(sorted(seen))
+                                         for seen in col_seen[icol])))
+                           for icol in range(nside)])
+        val_colour = rank([(val_colour[val], tuple(sorted(val_seen[val])))
+                           for val in range(nside + 1)])
+
+    def order(colour):
+        """Sort the boxes of lines by colour, then the lines in each"""
+        groups = [sorted(range(first, first + nbox), key=colour.__getitem__)
+                  for first in range(0, nside, nbox)]
+        groups.sort(key=lambda group: [colour[i] for i in group])
+        return [i for group in groups for i in group]
+
+    return order(row_colour), order(col_colour)
+
+
+
+def canonical_form(grid):
+    """
+    Get the canonical form of a puzzle, and the transformation to it
+    @param grid  The puzzle, list of lists, with zeros for unknown values
+    @return line  The canonical puzzle in the one-line format
+    @return transform  (transposed, rows, cols, relabel), for transform_grid
+                       and untransform_grid
+    """
+    nside = len(grid)
+    best = None
+    for transposed in (False, True):
+        board = transpose(grid) if transposed else grid
+        rows, cols = get_order(board)
+
+        # .. Number the digits in the order they first appear
+        relabel = {}
+        for irow in rows:
+            for icol in cols:
+                val = board[irow][icol]
+                if val and val not in relabel:
+                    relabel[val] = len(relabel) + 1
+        for val in range(1, nside + 1):
+            if val not in relabel:
+                relabel[val] = len(relabel) + 1
+
+        transform = (transposed, rows, cols, relabel)
+        line = grid_to_line(transform_grid(grid, transform))
+        if best is None or line < best[0]:
+            best = (line, transform)
+    return best
+
+
+
+def transform_grid(grid, transform):
+    """
+    Apply a transformation from canonical_form to a grid
+    @param grid  List of lists, with zeros for unknown values
+    @param transform  (transposed, rows, cols, relabel)
+    @return  The transformed grid, list of lists
+    """
+    transposed, rows, cols, relabel = transform
+    board = transpose(grid) if transposed else grid
+    return [[relabel[board[irow][icol]] if board[irow][icol] else 0
+             for icol in cols] for irow in rows]
+
+
+
+def untransform_grid(grid, transform):
+    """
+    Undo a transformation from canonical_form
+    @param grid  The transformed grid, list of lists
+    @param transform  (transposed, rows, cols, relabel)
+    @return  The grid before the transformation, list of lists
+    """
+    transposed, rows, cols, relabel = transform
+    original = {new: old for old, new in relabel.items()}
+    board = [[0] * len(grid) for irow in range(len(grid))]
+    for i, irow in enumerate(rows):
+        for j, icol in enumerate(cols):
+            val = grid[i][j]
+            board[irow][icol] = original[val] if val else 0
+    return transpose(board) if transposed else board
+
+
+
+class SolveCache:
+    """
+    A size-bounded, least-recently-used cache of solutions, keyed by the
+    puzzle as given and by its canonical form, with an optional store on
+    disk (a dbm file) that is kept across runs. Use solve in place of
+    solver.solve.
+    """
+    def __init__(self, maxsize=10000, path=None):
+        """
+        Create the cache
+        @param maxsize  Most puzzles to keep in memory, for each kind of key
+        @param path  File for the store on disk, or None for no store
+        """
+        self.maxsize = maxsize
+        self.exact = OrderedDict()          # Puzzle line: solution line
+        self.canonical = OrderedDict()      # Canonical line: solution line
+        self.store = dbm.open(path, 'c') if path else None
+        self.hits = 0
+        self.misses = 0
+
+
+    def close(self):
+        """Close the store on disk, if there is one"""
+        if self.store is not None:
+            self.store.close()
+            self.store = None
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+    def info(self):
+        """
+        Get the hits and misses so far
+        @return  CacheInfo(hits, misses, maxsize, currsize)
+        """
+        return CacheInfo(self.hits, self.misses, self.maxsize,
+                         len(self.canonical))
+
+
+    def remember(self, entries, key, value):
+        """
+        Add an entry to an LRU dictionary, dropping the oldest if it is full
+        @param entries  The OrderedDict
+        @param key  The key
+        @param value  The value
+        """
+        entries[key] = value
+        entries.move_to_end(key)
+        if len(entries) > self.maxsize:
+            entries.popitem(last=False)
+
+
+    def lookup(self, line, canonical):
+        """
+        Look up a puzzle
+        @param line  The puzzle in the one-line format
+        @param canonical  Function that returns (canonical line, transform)
+        @return  The solution line (NO_SOLUTION if none), and the canonical
+                 form if it was worked out; the solution is None for a miss
+        """
+        if line in self.exact:
+            self.exact.move_to_end(line)
+            return self.exact[line], None
+
+        form = canonical()
+        key = form[0]
+        if key in self.canonical:
+            self.canonical.move_to_end(key)
+            solution = self.canonical[key]
+        elif self.store is not None and key in self.store:
+            solution = self.store[key].decode()
+            self.remember(self.canonical, key, solution)
+        else:
+            return None, form
+
+        if solution != NO_SOLUTION:
+            solution = grid_to_line(untransform_grid(line_to_grid(solution),
+                                                     form[1]))
+        self.remember(self.exact, line, solution)
+        return solution, form
+
+
+    def solve(self, original, boardPlot=None, **options):
+        """
+        Solve a puzzle, from the cache if it has been solved before
+        @param original  Starting grid, with zeros for unknown values
+        @param boardPlot  Class for plotting the board; default NullBoard.
+                          Only a puzzle that misses the cache is shown.
+        @param options  Keyword arguments for solver.solve, e.g. stats
+        @return grid  The solved grid, or the starting grid if there is no
+                      solution
+        @return success  True if solved
+        """
+        line = grid_to_line(original)
+        solution, form = self.lookup(line, lambda: canonical_form(original))
+        if solution is not None:
+            self.hits += 1
+            if solution == NO_SOLUTION:
+                return [row[:] for row in original], False
+            return line_to_grid(solution), True
+
+        self.misses += 1
+        grid, success = solve(original, boardPlot or NullBoard(), **options)
+        key, transform = form
+        if success:
+            solution = grid_to_line(transform_grid(grid, transform))
+            self.remember(self.exact, line, grid_to_line(grid))
+        else:
+            solution = NO_SOLUTION
+            self.remember(self.exact, line, NO_SOLUTION)
+        self.remember(self.canonical, key, solution)
+        if self.store is not None:
+            self.store[key] = solution
+        return grid, success
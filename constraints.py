@@ -4,31 +4,109 @@
 Created on Thu Mar 11 07:01:49 2021
 
 @author: prowe
+
+Constraints are arcs (i, j) between cells i and j that must differ, where
+a cell is identified by its index row * nside + col into the flat board.
+The arcs, peers and units for a board size are built once, by get_index.
+"""
+
+from collections import namedtuple
+from functools import lru_cache
+from math import isqrt
+
+
+ConstraintIndex = namedtuple('ConstraintIndex', ['nside', 'units',
+                                                 'cell_units', 'peers',
+                                                 'arcs', 'reverse_arcs'])
+ConstraintIndex.__doc__ = """
+Static constraint structure of a Sudoku board of one size. Everything is
+a tuple of int cell ids, so it is shared freely and never copied.
+    nside  Elements in a side of the board
+    units  All rows, then all columns, then all boxes; tuples of cell ids
+    cell_units  For each cell, the units (row, column, box) containing it
+    peers  For each cell, the cells that share a unit with it: the row,
+           then the column, then the rest of the box
+    arcs  All arcs (i, j), grouped by i, in the order of peers
+    reverse_arcs  For each cell i, the arcs (j, i) from its peers to it
 """
 
+
+@lru_cache(maxsize=None)
+def get_index(nside=9):
+    """
+    Get the constraint index for a board, building it on first use
+    @param nside  The dimensions of each side of the square board, int
+    @return  The ConstraintIndex, shared by all callers
+    """
+    nbox = isqrt(nside)
+    rows = tuple(tuple(irow * nside + icol for icol in range(nside))
+                 for irow in range(nside))
+    cols = tuple(tuple(irow * nside + icol for irow in range(nside))
+                 for icol in range(nside))
+    boxes = tuple(tuple((ibox_row + irow) * nside + ibox_col + icol
+                        for irow in range(nbox) for icol in range(nbox))
+                  for ibox_row in range(0, nside, nbox)
+                  for ibox_col in range(0, nside, nbox))
+
+    cell_units = []
+    peers = []
+    for irow in range(nside):
+        for icol in range(nside):
+            i = irow * nside + icol
+            row = rows[irow]
+            col = cols[icol]
+            box = boxes[irow // nbox * nbox + icol // nbox]
+            cell_units.append((row, col, box))
+            peers.append(tuple([j for j in row if j != i]
+                               + [j for j in col if j != i]
+                               + [j for j in box
+                                  if j // nside != irow and j % nside != icol]))
+
+    arcs = tuple((i, j) for i, cell_peers in enumerate(peers)
+                 for j in cell_peers)
+    reverse_arcs = tuple(tuple((j, i) for j in cell_peers)
+                         for i, cell_peers in enumerate(peers))
+
+    return ConstraintIndex(nside, rows + cols + boxes, tuple(cell_units),
+                           tuple(peers), arcs, reverse_arcs)
+
+
+
 def qc_board_and_constraints(board, constraints):
     """
     Purpose: When the board first comes in, do a check to see if any of the
     fixed values are duplicates
-    @param board  The Sudoku board: A list of lists of variable class instances
-    @param constraints  The unallowed values for each cell, list of tuples
+    @param board  The Sudoku board, a Board
+    @param constraints  The unallowed values for each cell, list of arcs
+    @return constraints  The arcs whose first cell is not fixed
+    @return success  False if two fixed cells in an arc have the same value
     """
-    i = 0
-    while i < len(constraints):
-        ([irow, icol], [jrow, jcol]) = constraints[i]
-        xi = board[irow][icol]
-        xj = board[jrow][jcol]
-        if xi.fixed and xj.fixed and xi.get_only_value() == xj.get_only_value():
+    domains = board.domains
+    fixed = board.fixed
+    for i, j in constraints:
+        if fixed[i] and fixed[j] and domains[i] == domains[j]:
             return constraints, False
 
-        if xi.fixed:
-            # Remove this constraint; don't update i
-            constraints.pop(i)
-        elif not xi.fixed:
-            # update i
-            i += 1
+    # Fixed cells cannot change, so their arcs can be dropped
+    return [arc for arc in constraints if not fixed[arc[0]]], True
 
-    return constraints, True
+
+
+def find_conflict(grid):
+    """
+    Find two given values that break the rules: the same value twice in a
+    row, column or box
+    @param grid  The puzzle, list of lists, with zeros for unknown values
+    @return  (i, j), the cell ids of the first two that clash, or None
+    """
+    peers = get_index(len(grid)).peers
+    values = [val for row in grid for val in row]
+    for i, val in enumerate(values):
+        if val:
+            for j in peers[i]:
+                if values[j] == val:
+                    return i, j
+    return None
 
 
 
@@ -36,16 +114,15 @@ def final_constraints(board, constraints):
     """
     Purpose: When the board is finished, do a final check to see if any of
     the values are duplicates
-    @param board  The Sudoku board: A list of lists of variable class instances
-    @param constraints  The unallowed values for each cell, list of tuples
+    @param board  The Sudoku board, a Board
+    @param constraints  The unallowed values for each cell, list of arcs
     """
-    while constraints:
-        ([irow, icol], [jrow, jcol]) = constraints.pop()
-        xi = board[irow][icol]
-        xj = board[jrow][jcol]
-        if not xi.get_only_value() or not xj.get_only_value():
+    domains = board.domains
+    for i, j in constraints:
+        mask = domains[i]
+        if not mask or mask & (mask - 1):
             return False
-        if xi.get_only_value() == xj.get_only_value():
+        if mask == domains[j]:
             return False
 
     return True
@@ -55,11 +132,10 @@ def final_constraints(board, constraints):
 def get_all_constraints(max_domain_val):
     """
     Purpose: get all binary constraints of the form xi,xj and put them in
-    a list. To save space, we just put the row and column indices in the
-    list.
+    a list. To save space, we just put the cell indices in the list.
     @param max_domain_val  int, The dimensions of each side of the square board
-    @return constraints  list of tuples containing 2 lists with 2 elements each:
-                     [([xi_row, xi_col],[xj_row,xj_col]), ... ]
+    @return constraints  list of tuples containing 2 cell indices:
+                     [(xi, xj), ... ], where xi = xi_row * max_domain_val + xi_col
 
     A Sudoku board has 9 rows and 9 columns, and is divided into 3x3 boxes.
     For each cell (row & column), there are therefore:
@@ -79,50 +155,11 @@ def get_all_constraints(max_domain_val):
         But we do that in another function, just to keep things simple.
 
     Notes:
-        1) There are a lot of nested loops here. However, this code is only
-           run once and it has to cover all squares. We could flatten the
-           Sudoku board to a 1x81 array (instead of 9x9) but it's probably not
-           worth the trouble.
+        1) The arcs come from get_index, which builds them once per board
+           size on a flattened board; this just copies them into a list
+           that the caller may modify.
     """
-
-    constraints = []
-    list_rows = range(max_domain_val)
-    list_cols = range(max_domain_val)
-
-
-    for irow in list_rows:
-        for icol in list_cols:
-
-            # .. Row: Add all column indices to row, except the variable's
-            for jcol in range(max_domain_val):
-                if jcol != icol:
-                    constraints.append(([irow, icol], [irow, jcol]))
-
-            # .. Column
-            for jrow in range(max_domain_val):
-                # Add all rows of this column, except the variable's column
-                if jrow != irow:
-                    constraints.append(([irow, icol], [jrow, icol]))
-
-            # .. Box
-            #    Add all row,column sets that share the box,
-            #    except the variable's row, column
-            #    and the ones that have already been one
-            ibox_row = int(irow/3) * 3
-            ibox_col = int(icol/3) * 3
-
-            irows = list(range(ibox_row, irow)) + list(range(irow, ibox_row+3))
-            icols = list(range(ibox_col, icol)) + list(range(icol, ibox_col+3))
-            #irows = [i for i in range(ibox_row, irow)] \
-            #         + [i for i in range(irow, ibox_row+3)]
-            #icols = [i for i in range(ibox_col, icol)] \
-            #         + [i for i in range(icol, ibox_col+3)]
-
-            for jrow in irows:
-                for jcol in icols:
-                    if jrow != irow and jcol != icol:
-                        constraints.append(([irow, icol], [jrow, jcol]))
-    return constraints
+    return list(get_index(max_domain_val).arcs)
 
 
 
@@ -132,34 +169,6 @@ def reverse_constraints(irow, icol, max_domain_val):
     @param irow  Index to row
     @param icol  Index to column
     @param max_domain_val  The dimensions of each side of the square board, int
+    @return  Tuple of arcs (xj, xi) from each peer xj to the cell xi
     """
-    xj_constraints = []
-
-
-    # .. Row: Add all column indices to row, except the variable's
-    for jcol in range(max_domain_val):
-        if jcol != icol:
-            xj_constraints.append(([irow, jcol], [irow, icol]))
-
-    # .. Column
-    for jrow in range(max_domain_val):
-        # Add all rows of this column, except the variable's column
-        if jrow != irow:
-            xj_constraints.append(([jrow, icol], [irow, icol]))
-
-    # .. Box
-    #    Add all row,column sets that share the box,
-    #    except the variable's row, column
-    #    and the ones that have already been one
-    ibox_row = int(irow/3) * 3
-    ibox_col = int(icol/3) * 3
-
-    irows = list(range(ibox_row, irow)) + list(range(irow, ibox_row+3))
-    icols = list(range(ibox_col, icol)) + list(range(icol, ibox_col+3))
-
-    for jrow in irows:
-        for jcol in icols:
-            if jrow != irow and jcol != icol:
-                xj_constraints.append(([jrow, jcol], [irow, icol]))
-
-    return xj_constraints
+    return get_index(max_domain_val).reverse_arcs[irow * max_domain_val + icol]
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 13:05:44 2026
+
+Solve Sudoku as an exact cover problem, with Knuth's Algorithm X and
+Dancing Links.
+
+Each candidate "value v in cell (r, c)" is a row of the cover matrix, with
+a 1 in four columns, one for each constraint it satisfies:
+    - cell (r, c) has a value
+    - row r has the value v
+    - column c has the value v
+    - the box holding (r, c) has the value v
+A solution is a set of rows with exactly one 1 in every column.
+
+The matrix is kept as circular doubly-linked lists in flat int lists
+(left, right, up, down and column of each node), rather than as node
+objects, which is much faster in Python.
+"""
+
+from functools import lru_cache
+from math import isqrt
+
+from constraints import find_conflict
+from limits import CHECK_EVERY
+
+
+
+@lru_cache(maxsize=None)
+def build_matrix(nside):
+    """
+    Build the sparse cover matrix for an empty board, once per board size.
+    The links are returned as tuples; copy them into lists to solve.
+    @param nside  Elements in a side of the board
+    @return  Tuples left, right, up, down, col and size, and a dictionary
+             of (cell, value) for the first node of each candidate row
+    """
+    ncells = nside * nside
+    nbox = isqrt(nside)
+    ncols = 4 * ncells
+
+    # .. Node 0 is the root; nodes 1...ncols are the column headers
+    left = list(range(-1, ncols))
+    left[0] = ncols
+    right = list(range(1, ncols + 2))
+    right[ncols] = 0
+    up = list(range(ncols + 1))
+    down = list(range(ncols + 1))
+    col = list(range(ncols + 1))
+    size = [0] * (ncols + 1)
+    candidates = {}
+
+    for irow in range(nside):
+        for icol in range(nside):
+            cell = irow * nside + icol
+            box = irow // nbox * nbox + icol // nbox
+            for ival in range(nside):
+                columns = (1 + cell,
+                           1 + ncells + irow * nside + ival,
+                           1 + 2 * ncells + icol * nside + ival,
+                           1 + 3 * ncells + box * nside + ival)
+                first = len(left)
+                candidates[first] = (cell, ival + 1)
+                for k, column in enumerate(columns):
+                    node = first + k
+                    left.append(first + (k - 1) % 4)
+                    right.append(first + (k + 1) % 4)
+                    # .. Add to the bottom of the column
+                    up.append(up[column])
+                    down.append(column)
+                    down[up[column]] = node
+                    up[column] = node
+                    col.append(column)
+                    size[column] += 1
+
+    return (tuple(left), tuple(right), tuple(up), tuple(down), tuple(col),
+            tuple(size), candidates)
+
+
+
+def dancing_links(grid, boardRep, stats=None, limits=None):
+    """
+    Solve the sudoku board using Algorithm X with Dancing Links
+    @param grid  The current numbers of the Sudoku board, list of lists
+    @param boardRep  The class for printing or plotting the board
+    @param stats  SolverStats to count the values tried in, or None
+    @param limits  limits.Limits on the time and values tried, or None
+    @return grid  The solved grid, or the starting grid if not solved
+    @return success  True if solved
+    @raises GaveUp  If a limit was reached before the search finished
+    """
+    if limits is not None:
+        limits.start()
+        max_nodes = limits.max_nodes
+    nside = len(grid)
+    left, right, up, down, col, size, candidates = build_matrix(nside)
+    left, right, up, down, size = (list(left), list(right), list(up),
+                                   list(down), list(size))
+    first_node = {value: node for node, value in candidates.items()}
+
+    def cover(column):
+        """Remove a column, and every row with a 1 in it, from the matrix"""
+        left[right[column]] = left[column]
+        right[left[column]] = right[column]
+        i = down[column]
+        while i != column:
+            j = right[i]
+            while j != i:
+                down[up[j]] = down[j]
+                up[down[j]] = up[j]
+                size[col[j]] -= 1
+                j = right[j]
+            i = down[i]
+
+    def uncover(column):
+        """Put back a column that was covered, in the reverse order"""
+        i = up[column]
+        while i != column:
+            j = left[i]
+            while j != i:
+                size[col[j]] += 1
+                down[up[j]] = j
+                up[down[j]] = j
+                j = left[j]
+            i = up[i]
+        left[right[column]] = column
+        right[left[column]] = column
+
+    def select(node):
+        """Cover the other columns of the row of node"""
+        j = right[node]
+        while j != node:
+            cover(col[j])
+            j = right[j]
+
+    def deselect(node):
+        """Undo select"""
+        j = left[node]
+        while j != node:
+            uncover(col[j])
+            j = left[j]
+
+    # .. Check the starting grid, then choose the rows of the fixed values
+    if find_conflict(grid) is not None:
+        boardRep.message('Starting board is not valid.')
+        return grid, False
+    values = [val for row in grid for val in row]
+    for cell, val in enumerate(values):
+        if val:
+            node = first_node[(cell, val)]
+            cover(col[node])
+            select(node)
+
+    solution = [row[:] for row in grid]
+    nodes = 0
+    next_check = CHECK_EVERY
+
+    def get_grid():
+        """Get a copy of the current grid, for the board representation"""
+        return [row[:] for row in solution]
+
+    def search():
+        """Algorithm X: True if the remaining columns can be covered"""
+        nonlocal nodes, next_check
+        if right[0] == 0:
+            return True
+
+        # .. Choose the column with the fewest rows
+        column = right[0]
+        best = column
+        fewest = size[column]
+        while column != 0 and fewest > 1:
+            if size[column] < fewest:
+                best = column
+                fewest = size[column]
+            column = right[column]
+        if fewest == 0:
+            return False
+
+        cover(best)
+        node = down[best]
+        while node != best:
+            # .. The nodes of each row are 4 in a row, after the headers
+            first = node - (node - 1) % 4
+            cell, val = candidates[first]
+            irow, icol = divmod(cell, nside)
+            if limits is not None:
+                # .. Unwinds the recursion; the matrix is thrown away
+                if max_nodes is not None and nodes >= max_nodes:
+                    raise limits.give_up(get_grid())
+                if nodes >= next_check:
+                    next_check = nodes + CHECK_EVERY
+                    if limits.should_stop():
+                        raise limits.give_up(get_grid())
+            solution[irow][icol] = val
+            nodes += 1
+            boardRep.cell_changed(irow, icol, val, 'assign', get_grid)
+
+            select(node)
+            if search():
+                return True
+            deselect(node)
+
+            solution[irow][icol] = 0
+            boardRep.cell_changed(irow, icol, 0, 'unassign', get_grid)
+            node = down[node]
+        uncover(best)
+        return False
+
+    try:
+        success = search()
+    finally:
+        if stats is not None:
+            stats.nodes += nodes
+    if not success:
+        return grid, False
+    return solution, True
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 15:20:37 2026
+
+Generate Sudoku puzzles with a unique solution, graded by what the solver
+needs to solve them.
+
+Run from terminal using:
+
+$ python generator.py --count 1000 --level hard --seed 1 --workers 0
+                      --output hard.txt
+
+Where
+- count is the number of puzzles to make (default 10).
+- level is the difficulty: easy, medium, hard, evil or diabolical
+  (default medium).
+- seed is optional: the same seed always gives the same puzzles, however
+  many workers are used (default 0).
+- workers is optional: the number of processes; 0 means one per core.
+- output is optional; by default puzzles go to standard output, in the
+  one-line format (see puzzle_io.py), ready for batch.py. A name ending
+  in .gz is written with gzip.
+
+The levels are:
+    easy    AC-3 alone solves it
+    medium  AC-3 with hidden singles solves it
+    hard        AC-3 with every inference rule (see inference.py) solves it
+    evil        the search is needed, and tries at most EVIL_NODES values
+    diabolical  the search tries more than EVIL_NODES values
+Propagation never removes a value that is part of a solution, so a puzzle
+that propagation solves has only one solution, and only the puzzles that
+need the search need a separate check: the search carries on from the
+propagated board until it finds a second solution or runs out of values.
+The values it tries, up to that point, are the nodes that grade it.
+"""
+
+import argparse
+import random
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+from itertools import islice
+from math import isqrt
+from os import cpu_count
+
+from board_plotter import NullBoard
+from constraints import get_all_constraints, qc_board_and_constraints
+from inference import RULES
+from puzzle_io import grid_to_line, open_puzzle_file
+from get_unassigned_variable import VariableOrder
+from solver import Search, arc_consistency3, get_board, solve
+from stats import SolverStats
+
+
+# The rules added at each level, in order of difficulty
+LEVELS = (('easy', ()),
+          ('medium', ('hidden_singles',)),
+          ('hard', tuple(RULES)))
+EVIL = 'evil'
+DIABOLICAL = 'diabolical'
+LEVEL_NAMES = tuple(name for name, rules in LEVELS) + (EVIL, DIABOLICAL)
+
+# Most values the search may try, with every rule and including the check
+# for a second solution, for an evil puzzle. Of 40 puzzles generated that
+# needed the search, 25 tried 4 values or fewer and 5 more than 10
+EVIL_NODES = 10
+
+
+
+def grade(grid, stats=None, hardest=DIABOLICAL):
+    """
+    Grade a puzzle by the techniques needed to solve it, and for a puzzle
+    that needs the search, by the values the search tries
+    @param grid  The puzzle, list of lists, with zeros for unknown values
+    @param stats  SolverStats to add the counts to, or None. For an evil or
+                  diabolical puzzle, nodes is the number of values the
+                  search tried.
+    @param hardest  Stop grading after this level, to save time
+    @return  'easy', 'medium', 'hard', 'evil' or 'diabolical', or None if
+             the puzzle does not have exactly one solution or is harder
+             than hardest
+    """
+    board = get_board(grid, len(grid))
+    constraints, success = qc_board_and_constraints(
+        board, get_all_constraints(len(grid)))
+    if not success:
+        return None
+
+    # .. Only the arcs from the fixed cells can remove a value to start with;
+    #    the others are queued as their cells are reduced to one value
+    fixed = board.fixed
+    constraints = [(i, j) for i, j in constraints if fixed[j]]
+
+    # .. Propagate with more rules at each level, carrying on from where the
+    #    last level stopped
+    for name, rules in LEVELS:
+        board = arc_consistency3(board, constraints, NullBoard(), stats, rules)
+        if board == -1:
+            return None
+        if board.is_complete():
+            return name
+        if name == hardest:
+            return None
+        constraints = ()
+
+    # .. Search from the propagated board, for up to two solutions, with
+    #    every rule, and grade by the values tried
+    if stats is None:
+        stats = SolverStats()
+    start_nodes = stats.nodes
+    board.start_trail()
+    VariableOrder(board)
+    search = Search(board, True, stats, tuple(RULES))
+    if search.run(NullBoard()) != 'solved' \
+      or search.run(NullBoard()) != 'failed':
+        return None
+    if stats.nodes - start_nodes <= EVIL_NODES:
+        return EVIL
+    if hardest == EVIL:
+        return None
+    return DIABOLICAL
+
+
+
+def random_solution(rng, nside=9):
+    """
+    Get a random solved grid: fill the boxes on the diagonal, which do not
+    share a row or column, with random values, then solve for the rest
+    @param rng  random.Random to draw from
+    @param nside  Elements in a side of the board
+    @return  The solved grid, list of lists
+    """
+    nbox = isqrt(nside)
+    while True:
+        grid = [[0] * nside for irow in range(nside)]
+        for ibox in range(0, nside, nbox):
+            values = rng.sample(range(1, nside + 1), nside)
+            for k, val in enumerate(values):
+                grid[ibox + k // nbox][ibox + k % nbox] = val
+        grid, success = solve(grid, NullBoard())
+        if success:
+            return grid
+
+
+
+def make_puzzle(rng, level='medium', nside=9):
+    """
+    Make a puzzle with a unique solution at a level, by taking values out of
+    a random solution, in random order, as long as the puzzle stays at or
+    below the level. If it does not reach the level, start again.
+    @param rng  random.Random to draw from
+    @param level  'easy', 'medium', 'hard', 'evil' or 'diabolical'
+    @param nside  Elements in a side of the board
+    @return  The puzzle, list of lists, with zeros for unknown values
+    """
+    target = LEVEL_NAMES.index(level)
+    while True:
+        puzzle = random_solution(rng, nside)
+        reached = 0
+        for cell in rng.sample(range(nside * nside), nside * nside):
+            irow, icol = divmod(cell, nside)
+            val = puzzle[irow][icol]
+            puzzle[irow][icol] = 0
+            name = grade(puzzle, hardest=level)
+            if name is None:
+                puzzle[irow][icol] = val
+            else:
+                reached = LEVEL_NAMES.index(name)
+        if reached == target:
+            return puzzle
+
+
+
+def generate_chunk(numbers, level='medium', seed=0, nside=9):
+    """
+    Make puzzles; this is what runs in the worker processes
+    @param numbers  Numbers of the puzzles to make. Each puzzle has its own
+                    random number generator, seeded by the seed and its
+                    number, so it does not matter which process makes it.
+    @param level  'easy', 'medium', 'hard', 'evil' or 'diabolical'
+    @param seed  The seed for the whole run
+    @param nside  Elements in a side of the board
+    @return  List of puzzles in the one-line format, in order
+    """
+    return [grid_to_line(make_puzzle(random.Random('%s:%d' % (seed, number)),
+                                     level, nside))
+            for number in numbers]
+
+
+
+def generate(count, level='medium', seed=0, workers=1, chunksize=16,
+             nside=9):
+    """
+    Make puzzles, in a pool of worker processes if workers is not 1
+    @param count  Number of puzzles to make
+    @param level  'easy', 'medium', 'hard', 'evil' or 'diabolical'
+    @param seed  The seed; the same seed gives the same puzzles
+    @param workers  Number of processes; 0 or None for one per core
+    @param chunksize  Number of puzzles made by a worker at a time
+    @param nside  Elements in a side of the board
+    @return  Generator of puzzles in the one-line format, in order
+    """
+    numbers = iter(range(count))
+    chunks = iter(lambda: list(islice(numbers, chunksize)), [])
+    if workers == 1:
+        for chunk in chunks:
+            yield from generate_chunk(chunk, level, seed, nside)
+        return
+
+    workers = workers or cpu_count() or 1
+    with ProcessPoolExecutor(workers) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.submit(generate_chunk, chunk, level, seed,
+                                       nside))
+            if len(pending) >= 2 * workers:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+
+def main(argv=None):
+    """
+    Run the generator
+    @param argv  Command-line arguments; default sys.argv[1:]
+    """
+    parser = argparse.ArgumentParser(description='Generate Sudoku puzzles '
+                                     'with a unique solution.')
+    parser.add_argument('--count', type=int, default=10)
+    parser.add_argument('--level', choices=LEVEL_NAMES, default='medium')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=1,
+                        help='number of processes; 0 for one per core')
+    parser.add_argument('--chunksize', type=int, default=16,
+                        help='puzzles made by a worker at a time')
+    parser.add_argument('--output', default='-',
+                        help='file for the puzzles; - for standard output')
+    args = parser.parse_args(argv)
+
+    puzzles = generate(args.count, args.level, args.seed, args.workers,
+                       args.chunksize)
+    outfile = sys.stdout if args.output == '-' \
+        else open_puzzle_file(args.output, 'w')
+    try:
+        outfile.write('# level: %s, seed: %d\n' % (args.level, args.seed))
+        for line in puzzles:
+            outfile.write(line + '\n')
+    finally:
+        if outfile is not sys.stdout:
+            outfile.close()
+
+
+
+if __name__ == '__main__':
+    main()
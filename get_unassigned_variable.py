@@ -6,6 +6,8 @@ Created on Sat Mar 13 08:35:26 2021
 @author: prowe
 """
 
+from constraints import get_index
+from variable import mask_to_values, popcount
 
 
 def get_next_unassigned(board):
@@ -37,6 +39,10 @@ def get_unassigned_using_mrv(board):
                   Sudoku board
     """
 
+    if isinstance(board.watcher, VariableOrder):
+        idx = board.watcher.get_mrv()
+        return board[idx // board.nside][idx % board.nside]
+
     mrv = 1e4
     min_mrv = 2
     chosen = False
@@ -76,11 +82,15 @@ def get_unassigned_using_mrv_and_degree(board):
                   a 2-D array of the board
     @return cell  Class instance of Variable; a cell of the Sudoku board
     """
+    if isinstance(board.watcher, VariableOrder):
+        idx = board.watcher.get_mrv_and_degree()
+        return board[idx // board.nside][idx % board.nside]
+
     chosen = False
     mrv = 1e4
     degree = 0
     min_mrv = 2                      # min number remaining values possible
-    max_degree = 20                  # max number constraints left (9x9 Sudoku)
+    max_degree = len(get_index(board.nside).peers[0])   # max constraints left
     for row in board:
         for cell in row:
             remvals = cell.get_domain_size()   # remaining values
@@ -114,40 +124,169 @@ def get_unassigned_using_mrv_and_degree(board):
     return board[chosen_row][chosen_col]
 
 
+def get_domain_values(cell, board):
+    """
+    Get the values to try for a variable, in the order of its domain (no
+    heuristic): the order a set of the values iterates in, which is not
+    ascending (see get_ascending_values). This has always been the default
+    order, so the node counts and the solution found for a puzzle with
+    several depend on it
+    @param cell  Class instance of Variable; a cell of the Sudoku board
+    @param board  The Sudoku board, a Board
+    @return  List of values
+    """
+    return list(cell.get_domain())
+
+
+
+def get_ascending_values(cell, board):
+    """
+    Get the values to try for a variable, lowest first
+    @param cell  Class instance of Variable; a cell of the Sudoku board
+    @param board  The Sudoku board, a Board
+    @return  List of values
+    """
+    return mask_to_values(cell.mask)
+
+
+
+def get_least_constraining_values(cell, board):
+    """
+    Get the values to try for a variable using the Least Constraining Value
+    (LCV) heuristic: try first the value that rules out the fewest choices
+    for the other variables, i.e. that is in the domains of the fewest
+    unassigned peers. Ties go to the lowest value.
+    @param cell  Class instance of Variable; a cell of the Sudoku board
+    @param board  The Sudoku board, a Board
+    @return  List of values
+    """
+    nside = board.nside
+    domains = board.domains
+    values = mask_to_values(cell.mask)
+    ruled_out = [0] * len(values)
+    for j in get_index(nside).peers[cell.row * nside + cell.col]:
+        mask = domains[j]
+        if mask & (mask - 1):
+            for k, val in enumerate(values):
+                ruled_out[k] += mask >> (val - 1) & 1
+    return [val for count, val in sorted(zip(ruled_out, values))]
+
+
 def get_constraints_for_x(cell, board):
     """
-    Get the constraints for a given cell cell
+    Get the constraints for a given cell cell: the number of its peers (cells
+    in the same row, column or box) that are not yet assigned
     @param cell  Class instance of Variable; a cell of the Sudoku board
-    @param board
+    @param board  The Sudoku board, a Board
     @return  Number of constraints
     """
+    nside = cell.max_domain_val
+    domains = board.domains
     nconstraints = 0
-
-    # Row
-    for cellj in board[cell.row][:cell.col]:
-        if cellj.get_domain_size() > 1:
-            nconstraints += 1
-    for cellj in board[cell.row][cell.col+1:]:
-        if cellj.get_domain_size() > 1:
+    for j in get_index(nside).peers[cell.row * nside + cell.col]:
+        mask = domains[j]
+        if mask & (mask - 1):
             nconstraints += 1
 
-    # Col
-    for irow in range(cell.row):
-        if board[irow][cell.col].get_domain_size() > 1:
-            nconstraints += 1
+    return nconstraints
 
-    for irow in range(cell.row+1, cell.max_domain_val):
-        if board[irow][cell.col].get_domain_size() > 1:
-            nconstraints += 1
 
-    # .. This would not generalize to a new board, but leave for now
-    ibox_row = int(cell.row/3) * 3
-    ibox_col = int(cell.col/3) * 3
 
-    if board[ibox_row+1][ibox_col+1].get_domain_size() > 1 \
-      or board[ibox_row+1][ibox_col+2].get_domain_size() > 1 \
-      or board[ibox_row+2][ibox_col+1].get_domain_size() > 1 \
-      or board[ibox_row+2][ibox_col+2].get_domain_size() > 1:
-        nconstraints += 1
+class VariableOrder:
+    """
+    Keeps what the MRV and degree heuristics need up to date as the
+    domains change, so the next variable can be chosen without scanning the
+    whole board:
+        - buckets[n] is the set of cells with n values left (n >= 2)
+        - degree[i] is the number of unassigned peers of cell i
+    Attach it to a Board with VariableOrder(board); the board then reports
+    every change (including undos) to domain_changed. The get_unassigned_*
+    functions use it when it is attached.
 
-    return nconstraints
+    Keeping a bucket up to date is O(1) a change, but choosing from it is
+    not: the smallest bucket is scanned, so a choice is O(cells in that
+    bucket), not the O(1) of a structure kept in order. Keeping the cells
+    of a bucket ordered by degree would cost a move for each unassigned
+    peer (up to 72 at 25x25) every time a cell is assigned or undone, which
+    happens far more often than a choice. The scan is one pass in C over a
+    bucket that AC-3 has already made small, and the choice is made once a
+    node: on a 25x25 board half empty, after AC-3, it takes about 1.5 us for
+    MRV and 7.5 us with degree, against about 48 us for AC-3 at the node.
+    """
+    def __init__(self, board):
+        """
+        Build the buckets and degrees for the board, and attach to it
+        @param board  The board, a Board
+        """
+        self.nside = board.nside
+        self.peers = get_index(board.nside).peers
+        self.buckets = [set() for n in range(board.nside + 1)]
+        self.degree = [0] * board.ncells
+        for i, mask in enumerate(board.domains):
+            if popcount(mask) > 1:
+                self.buckets[popcount(mask)].add(i)
+                for j in self.peers[i]:
+                    self.degree[j] += 1
+        board.watcher = self
+
+
+    def domain_changed(self, idx, old, new):
+        """
+        Move a cell to the bucket for its new domain size, and update the
+        degree of its peers if it became assigned or unassigned
+        @param idx  Index to the cell
+        @param old  The old domain bitmask
+        @param new  The new domain bitmask
+        """
+        nold = popcount(old)
+        nnew = popcount(new)
+        if nold == nnew:
+            return
+        if nold > 1:
+            self.buckets[nold].discard(idx)
+        if nnew > 1:
+            self.buckets[nnew].add(idx)
+        if (nold > 1) != (nnew > 1):
+            delta = 1 if nnew > 1 else -1
+            degree = self.degree
+            for j in self.peers[idx]:
+                degree[j] += delta
+
+
+    def get_mrv(self):
+        """
+        Get the first cell (in row-major order) with the fewest values
+        left; O(cells in the smallest bucket)
+        @return  Index to the cell
+        """
+        for bucket in self.buckets[2:]:
+            if bucket:
+                return min(bucket)
+        raise ValueError('Everything seems to be assigned!')
+
+
+    def get_mrv_and_degree(self):
+        """
+        Get the cell with the fewest values left and, of those, the most
+        unassigned peers; ties go to the first in row-major order, as for
+        the scan in get_unassigned_using_mrv_and_degree. O(cells in the
+        smallest bucket)
+        @return  Index to the cell
+        """
+        degree = self.degree
+        for bucket in self.buckets[2:]:
+            if bucket:
+                return max(bucket, key=lambda i: (degree[i], -i))
+        raise ValueError('Everything seems to be assigned!')
+
+
+
+# Heuristics by name, for the registry (see registry.py) and solver.Search
+ORDERINGS = {'next': get_next_unassigned,
+             'mrv': get_unassigned_using_mrv,
+             'mrv_degree': get_unassigned_using_mrv_and_degree}
+VALUE_ORDERINGS = {'domain': get_domain_values,
+                   'ascending': get_ascending_values,
+                   'lcv': get_least_constraining_values}
+DEFAULT_ORDERING = 'mrv_degree'
+DEFAULT_VALUE_ORDERING = 'domain'
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 11:40:07 2026
+
+Inference rules that look at whole units (rows, columns, boxes), to run
+when AC-3 can do nothing more:
+    hidden_singles  A value with only one place left in a unit goes there
+    naked_pairs     Two cells in a unit with the same two values take
+                    those values away from the rest of the unit
+    hidden_pairs    Two values with the same two places left in a unit
+                    leave those two cells with only those two values
+
+Each rule returns the set of cells it changed, or -1 if it found that the
+board cannot be solved. All changes go through Board.set_domain, so they
+are on the trail and are undone when the search backs up.
+"""
+
+from constraints import get_index
+from variable import popcount
+
+
+def hidden_singles(board, units):
+    """
+    Place each value that has only one possible cell in a unit
+    @param board  The board, a Board
+    @param units  The units of the board, tuples of cell ids
+    @return  Set of cells changed, or -1 if a value has no place in a unit
+    """
+    domains = board.domains
+    full_mask = board.full_mask
+    changed = set()
+    for unit in units:
+        once = 0
+        more = 0
+        for i in unit:
+            mask = domains[i]
+            more |= once & mask
+            once |= mask
+        if once != full_mask:
+            return -1
+        single = once & ~more
+        if not single:
+            continue
+        for i in unit:
+            mask = domains[i]
+            only = mask & single
+            if only and only != mask:
+                if only & (only - 1):
+                    # Two values that can only go in this one cell
+                    return -1
+                board.set_domain(i, only)
+                changed.add(i)
+    return changed
+
+
+
+def naked_pairs(board, units):
+    """
+    Remove the values of a naked pair from the other cells of its unit
+    @param board  The board, a Board
+    @param units  The units of the board, tuples of cell ids
+    @return  Set of cells changed, or -1 if three cells share two values
+    """
+    domains = board.domains
+    changed = set()
+    for unit in units:
+        pairs = {}
+        for i in unit:
+            mask = domains[i]
+            if popcount(mask) == 2:
+                pairs[mask] = pairs.get(mask, 0) + 1
+        for mask, count in pairs.items():
+            if count < 2:
+                continue
+            if count > 2:
+                return -1
+            for i in unit:
+                other = domains[i]
+                if other != mask and other & mask:
+                    other &= ~mask
+                    if not other:
+                        return -1
+                    board.set_domain(i, other)
+                    changed.add(i)
+    return changed
+
+
+
+def hidden_pairs(board, units):
+    """
+    Reduce the two cells of a hidden pair to the two values of the pair
+    @param board  The board, a Board
+    @param units  The units of the board, tuples of cell ids
+    @return  Set of cells changed
+    """
+    domains = board.domains
+    nside = board.nside
+    changed = set()
+    for unit in units:
+        # .. places[v] has bit k set if value v+1 can go in cell unit[k]
+        places = [0] * nside
+        for k, i in enumerate(unit):
+            mask = domains[i]
+            while mask:
+                lowbit = mask & -mask
+                places[lowbit.bit_length() - 1] |= 1 << k
+                mask ^= lowbit
+
+        # .. Values with exactly two places, grouped by the places
+        values_at = {}
+        for ival, where in enumerate(places):
+            if popcount(where) == 2:
+                values_at[where] = values_at.get(where, 0) | 1 << ival
+
+        for where, pair in values_at.items():
+            if popcount(pair) == 2:
+                for k, i in enumerate(unit):
+                    if where >> k & 1 and domains[i] != pair:
+                        board.set_domain(i, pair)
+                        changed.add(i)
+    return changed
+
+
+
+RULES = {'hidden_singles': hidden_singles,
+         'naked_pairs': naked_pairs,
+         'hidden_pairs': hidden_pairs}
+
+
+
+def apply_inference(board, rules, boardPlot, stats=None):
+    """
+    Apply inference rules, in order, until one of them changes the board
+    @param board  The board, a Board
+    @param rules  Names of the rules to apply, from RULES
+    @param boardPlot  Class for plotting the board
+    @param stats  SolverStats to count the changes made by each rule in
+    @return  Set of cells changed (empty if no rule changed anything),
+             or -1 if the board cannot be solved
+    """
+    units = get_index(board.nside).units
+    for rule in rules:
+        changed = RULES[rule](board, units)
+        if changed == -1:
+            return -1
+        if changed:
+            if stats is not None:
+                setattr(stats, rule, getattr(stats, rule) + len(changed))
+            nside = board.nside
+            for i in changed:
+                mask = board.domains[i]
+                if not mask & (mask - 1):
+                    boardPlot.cell_changed(i // nside, i % nside,
+                                           mask.bit_length(), 'propagate',
+                                           board.get_grid)
+            return changed
+    return set()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 19:40:12 2026
+
+Limits on a solve: a time limit, a budget of values to try, and a flag
+another thread or process can set to cancel it. The solvers check them in
+their search loops, every CHECK_EVERY values tried, and raise GaveUp if
+one is reached. The counts in the SolverStats passed to the solver are
+kept up to the point where it stopped.
+
+For example:
+    limits = Limits(seconds=1, max_nodes=100000)
+    try:
+        grid, success = solve(grid, NullBoard(), stats=stats, limits=limits)
+    except GaveUp as exc:
+        print('Gave up:', exc.reason, 'after', stats.nodes, 'values')
+"""
+
+from time import perf_counter
+
+
+CHECK_EVERY = 32        # Values tried between checks of the clock and flag
+REASONS = ('timeout', 'nodes', 'cancelled')
+
+
+
+class GaveUp(Exception):
+    """A solver stopped before finishing, because a limit was reached"""
+    def __init__(self, reason, grid):
+        """
+        @param reason  'timeout', 'nodes' or 'cancelled'
+        @param grid  The board when the solver stopped, list of lists, with
+                     zeros for the cells not yet assigned
+        @raises ValueError  If reason is not one of REASONS
+        """
+        if reason not in REASONS:
+            raise ValueError('Unknown reason: ' + str(reason) + '; choose '
+                             'from ' + ', '.join(REASONS))
+        super().__init__('Gave up: ' + reason)
+        self.reason = reason
+        self.grid = grid
+
+
+
+class Limits:
+    """
+    Limits for each call to a solver. The clock starts again at each call,
+    so one Limits can be used for many puzzles.
+    """
+    def __init__(self, seconds=None, max_nodes=None, cancel=None):
+        """
+        Set up the limits; None for no limit
+        @param seconds  Most time for a solve, in seconds
+        @param max_nodes  Most values for the search to try in a solve
+        @param cancel  Flag to cancel the solve when it is set, with an
+                       is_set method, e.g. a threading.Event or
+                       multiprocessing.Event
+        """
+        self.seconds = seconds
+        self.max_nodes = max_nodes
+        self.cancel = cancel
+        self.deadline = None
+        self.reason = None          # Why the last solve stopped, if it did
+
+
+    def start(self):
+        """Start the clock for a solve; the solvers call this"""
+        self.reason = None
+        if self.seconds is None:
+            self.deadline = None
+        else:
+            self.deadline = perf_counter() + self.seconds
+
+
+    def should_stop(self):
+        """
+        Check the clock and the flag
+        @return  True if the solve should stop now
+        """
+        if self.cancel is not None and self.cancel.is_set():
+            self.reason = 'cancelled'
+        elif self.deadline is not None and perf_counter() >= self.deadline:
+            self.reason = 'timeout'
+        return self.reason is not None
+
+
+    def give_up(self, grid):
+        """
+        Get the exception for a search that paused before finishing
+        @param grid  The board when it stopped, list of lists
+        @return  GaveUp, with the reason from should_stop, or 'nodes' if the
+                 search used up max_nodes
+        """
+        if self.reason is None:
+            self.reason = 'nodes'
+        return GaveUp(self.reason, grid)
@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 10:02:15 2026
+
+Reading and writing puzzles as text, in two formats:
+    - The .puzz format: one "row col value" triplet per line, with rows
+      and columns counted from 1. A blank line ends a puzzle, so several
+      puzzles can share one file.
+    - The one-line format: all the cells of the board in a single line,
+      row by row, with 0 or . for an empty cell. Values over 9 (for boards
+      of 16x16 or 25x25) are written as letters: A for 10, B for 11, etc.
+
+Boards may be nside x nside for any nside that is a square number up to
+25 (4, 9, 16 or 25).
+
+Files are read and written as streams, one puzzle at a time, so memory
+does not grow with the size of the file. open_puzzle_file opens
+gzip-compressed files (by their first bytes, or a .gz name for writing)
+as if they were plain text. read_records reports a malformed puzzle as a
+Record with an error, instead of stopping, and read_fixed_width reads the
+one-line format as records of a fixed number of characters, with or
+without line breaks between them.
+"""
+
+import gzip
+from collections import namedtuple
+from math import isqrt
+
+
+EMPTY_CHARS = '0.'
+VALUE_CHARS = '123456789ABCDEFGHIJKLMNOP'     # The character for 1...25
+MAX_NSIDE = len(VALUE_CHARS)
+GZIP_MAGIC = b'\x1f\x8b'
+BLOCK_SIZE = 1 << 16            # Characters read at a time by read_fixed_width
+
+# A puzzle read from a stream: its number in the stream (from 1, counting
+# malformed ones), the line (or, for fixed-width records, the record) it
+# starts on, and either the grid or, if it could not be read, the error
+Record = namedtuple('Record', 'number lineno grid error')
+
+
+def get_nside(largest):
+    """
+    Get the smallest supported board size that can hold a value
+    @param largest  The largest row, column or value in the puzzle
+    @return  nside, at least 9
+    @raises ValueError  If the value is too large for any board
+    """
+    for nside in (9, 16, 25):
+        if largest <= nside:
+            return nside
+    raise ValueError('Value ' + str(largest) + ' is too large; boards up to '
+                     + str(MAX_NSIDE) + 'x' + str(MAX_NSIDE) + ' are supported.')
+
+
+def line_to_grid(line):
+    """
+    Get the grid for a puzzle in the one-line format
+    @param line  The puzzle, e.g. 81 characters for a 9x9 board
+    @return grid  The grid of numbers, list of lists
+    @raises ValueError  If the line is not a square board of valid values
+    """
+    line = line.strip()
+    nside = isqrt(len(line))
+    if nside * nside != len(line) or isqrt(nside) ** 2 != nside \
+      or not 1 < nside <= MAX_NSIDE:
+        raise ValueError('Puzzle line has ' + str(len(line))
+                         + ' characters; expected 16, 81, 256 or 625.')
+
+    vals = []
+    for char in line.upper():
+        if char in EMPTY_CHARS:
+            vals.append(0)
+        else:
+            val = VALUE_CHARS.find(char) + 1
+            if not 0 < val <= nside:
+                raise ValueError('Bad character in puzzle line: ' + repr(char))
+            vals.append(val)
+    return [vals[irow * nside:(irow + 1) * nside] for irow in range(nside)]
+
+
+
+def grid_to_line(grid):
+    """
+    Get the one-line format for a grid
+    @param grid  The grid of numbers, list of lists, 0 for empty cells
+    @return  The puzzle as a single line, with . for empty cells
+    """
+    return ''.join(VALUE_CHARS[val - 1] if val > 0 else '.'
+                   for row in grid for val in row)
+
+
+
+def triplets_to_grid(triplets, nside=None):
+    """
+    Get the grid for a puzzle given as triplets
+    @param triplets  List of (row, col, value), with row and col from 1
+    @param nside  Elements in a side of the board; by default the smallest
+                  board (9x9 or larger) that holds every row, col and value
+    @return grid  The grid of numbers, list of lists
+    @raises ValueError  If a row, col or value is out of range
+    """
+    if nside is None:
+        nside = get_nside(max(max(triplet) for triplet in triplets))
+    grid = [[0 for i in range(nside)] for j in range(nside)]
+    for row, col, val in triplets:
+        if not (0 < row <= nside and 0 < col <= nside and 0 <= val <= nside):
+            raise ValueError('Triplet out of range for a board of '
+                             + str(nside) + ': ' + str((row, col, val)))
+        grid[row - 1][col - 1] = val
+    return grid
+
+
+
+def read_records(lines, nside=None):
+    """
+    Read puzzles from lines of text, in either format, carrying on past
+    malformed ones. Lines that are empty or start with # separate puzzles
+    and are otherwise skipped. A bad line in a .puzz puzzle makes the whole
+    puzzle (up to the next separator) one malformed record.
+    @param lines  Iterable of lines, e.g. an open file
+    @param nside  Elements in a side of a board in the .puzz format; by
+                  default, worked out from the triplets
+    @return  Generator of Records
+    """
+    number = 0
+    triplets = []
+    start = 0               # Line the triplets started on
+    error = None            # The first error in the triplets
+
+    def end_triplets():
+        """Get the record for the triplets read so far"""
+        nonlocal number
+        number += 1
+        if error is None:
+            try:
+                return Record(number, start, triplets_to_grid(triplets, nside),
+                              None)
+            except ValueError as exc:
+                return Record(number, start, None, str(exc))
+        return Record(number, start, None, error)
+
+    for lineno, line in enumerate(lines, 1):
+        fields = line.split()
+        if len(fields) == 3 or (triplets and len(fields) > 1):
+            if not triplets and error is None:
+                start = lineno
+            try:
+                if len(fields) != 3:
+                    raise ValueError
+                triplets.append(tuple(int(field) for field in fields))
+            except ValueError:
+                if error is None:
+                    error = 'Cannot read puzzle line %d: %s' % (lineno,
+                                                               line.strip())
+            continue
+
+        if triplets or error is not None:
+            yield end_triplets()
+            triplets = []
+            error = None
+        if not fields or fields[0].startswith('#'):
+            continue
+
+        number += 1
+        if len(fields) == 1:
+            try:
+                yield Record(number, lineno, line_to_grid(fields[0]), None)
+            except ValueError as exc:
+                yield Record(number, lineno, None, 'Line %d: %s' % (lineno,
+                                                                     exc))
+        else:
+            yield Record(number, lineno, None, 'Cannot read puzzle line %d: '
+                         '%s' % (lineno, line.strip()))
+
+    if triplets or error is not None:
+        yield end_triplets()
+
+
+
+def read_puzzles(lines, nside=None):
+    """
+    Read puzzles from lines of text, in either format. Lines that are
+    empty or start with # separate puzzles and are otherwise skipped.
+    @param lines  Iterable of lines, e.g. an open file
+    @param nside  Elements in a side of a board in the .puzz format; by
+                  default, worked out from the triplets
+    @return  Generator of grids, list of lists
+    @raises ValueError  If a puzzle cannot be read
+    """
+    for record in read_records(lines, nside):
+        if record.error is not None:
+            raise ValueError(record.error)
+        yield record.grid
+
+
+
+def read_fixed_width(stream, width=81):
+    """
+    Read puzzles in the one-line format as records of a fixed width. Line
+    breaks and other white space between (or inside) records are skipped,
+    so the records may be on lines of their own or run together.
+    @param stream  Open text file, read BLOCK_SIZE characters at a time
+    @param width  Characters in a record: 81, 256 or 625
+    @return  Generator of Records, where lineno is the number of the record
+    """
+    number = 0
+    pending = ''
+    while True:
+        block = stream.read(BLOCK_SIZE)
+        pending += ''.join(block.split())
+        end = len(pending) - len(pending) % width
+        for first in range(0, end, width):
+            number += 1
+            try:
+                grid = line_to_grid(pending[first:first + width])
+                yield Record(number, number, grid, None)
+            except ValueError as exc:
+                yield Record(number, number, None, 'Record %d: %s'
+                             % (number, exc))
+        pending = pending[end:]
+        if not block:
+            break
+    if pending:
+        yield Record(number + 1, number + 1, None, 'Record %d: only %d of %d '
+                     'characters at the end of the file'
+                     % (number + 1, len(pending), width))
+
+
+
+def open_puzzle_file(filename, mode='r'):
+    """
+    Open a file of puzzles as text, compressed with gzip or not
+    @param filename  Name of the file
+    @param mode  'r' to read, 'w' to write or 'a' to append. A file is read
+                 as gzip if it starts with the gzip magic number, and
+                 written as gzip if its name ends with .gz.
+    @return  The open file, in text mode
+    """
+    if mode == 'r':
+        with open(filename, 'rb') as infile:
+            compressed = infile.read(len(GZIP_MAGIC)) == GZIP_MAGIC
+    else:
+        compressed = filename.endswith('.gz')
+    if compressed:
+        return gzip.open(filename, mode + 't')
+    return open(filename, mode)
+
+
+
+def grid_to_triplets(grid):
+    """
+    Get the triplets for a grid, for the .puzz format
+    @param grid  The grid of numbers, list of lists, 0 for empty cells
+    @return  List of (row, col, value), with row and col from 1
+    """
+    return [(irow + 1, icol + 1, val) for irow, row in enumerate(grid)
+            for icol, val in enumerate(row) if val > 0]
+
+
+
+def write_puzzles(outfile, grids, fmt='line'):
+    """
+    Write puzzles (or their solutions) one at a time, so they can be read
+    back by read_puzzles
+    @param outfile  Open text file, e.g. from open_puzzle_file
+    @param grids  Iterable of grids, list of lists, 0 for empty cells
+    @param fmt  'line' for the one-line format, one puzzle per line, or
+                'puzz' for triplets, with a blank line after each puzzle
+    @return  The number of puzzles written
+    @raises ValueError  If fmt is not one of these
+    """
+    if fmt not in ('line', 'puzz'):
+        raise ValueError('Unknown puzzle format: ' + str(fmt)
+                         + '; choose from line, puzz')
+    count = 0
+    for grid in grids:
+        if fmt == 'line':
+            outfile.write(grid_to_line(grid) + '\n')
+        else:
+            outfile.writelines('%d %d %d\n' % triplet
+                               for triplet in grid_to_triplets(grid))
+            outfile.write('\n')
+        count += 1
+    return count
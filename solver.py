@@ -14,37 +14,39 @@ By Penny Rowe
 AI with Prof. America Chambers, Spring 2021
 """
 
-from copy import deepcopy
+from collections import deque
+from time import perf_counter
 
-from variable import Variable
+from variable import Board
+from board_plotter import NullBoard
 from constraints import get_all_constraints, qc_board_and_constraints
-from constraints import reverse_constraints, final_constraints
+from constraints import get_index, final_constraints
+from inference import apply_inference
+from limits import CHECK_EVERY
 
-# Choose how to get the next unassigned variable
-#from get_unassigned_variable import get_next_unassigned as get_unassigned
-#from get_unassigned_variable import get_unassigned_using_mrv as get_unassigned
-from get_unassigned_variable import get_unassigned_using_mrv_and_degree as get_unassigned
+# The heuristics for choosing the next unassigned variable and the order
+# of its values are chosen by name (or passed as functions); see registry.py
+from get_unassigned_variable import ORDERINGS, VALUE_ORDERINGS
+from get_unassigned_variable import DEFAULT_ORDERING, DEFAULT_VALUE_ORDERING
+from get_unassigned_variable import VariableOrder
 
 
 
 
 def get_board(grid, nside=9):
     """
-    Create the board has a list of lists of each cell, where each cell is a
-    class containing a domain and a set of constraints
+    Create the board, where each cell has a domain stored as a bitmask.
+    Indexing the board gives Variable views, so board[row][col] is a
+    class containing a domain and whether it is fixed
     @param grid  The Numbers in the Sudoku board, as a list of list of int
     @param nside  Elements in a side of the board; default 9
+    @return  The board, a Board
     """
-    board = [[[] for i in range(nside)] for j in range(nside)]
-
-    board = [[Variable(i, j, nside) for i in range(nside)] for j in range(nside)]
-
+    board = Board(nside)
     for i, row_vals in enumerate(grid):
         for j, val in enumerate(row_vals):
-            if val == 0:
-                board[i][j] = Variable(i, j, nside)
-            else:
-                board[i][j] = Variable(i, j, nside, {val}, fix=True)
+            if val != 0:
+                board.fix(i, j, val)
     return board
 
 
@@ -52,24 +54,13 @@ def get_board(grid, nside=9):
 def get_grid(board):
     """
     Get the grid for the board
-    @param board ???
+    @param board  The board, a Board
+    @return  The grid, list of lists of int, with 0 for cells that are not
+             yet assigned and -1 for cells with an empty domain
     """
     if board == -1:
         return None
-    nrows = len(board)
-    ncols = len(board[0])
-
-    grid = [[0 for i in range(ncols)] for j in range(nrows)]
-    for i in range(nrows):
-        for j in range(ncols):
-            if board[i][j].get_domain_size() == 1:
-                grid[i][j] = board[i][j].get_only_value()
-            elif board[i][j].get_domain_size() == 0:
-                grid[i][j] = -1
-            else:
-                grid[i][j] = 0
-
-    return grid
+    return board.get_grid()
 
 
 
@@ -83,22 +74,37 @@ def is_complete(board):
     """
     if board == -1:
         return False
-    for row in board:
-        for var in row:
-            if var.get_domain_size() > 1:
-                return False
-    return True
+    return board.is_complete()
 
 
 
-def solve(original, boardPlot):
+def solve(original, boardPlot, use_trail=True, stats=None, inference=(),
+          select=None, order=None, limits=None):
     """
     Solve Sudoku given a set of cells with fixed values
     @param original Starting grid, with zeros for unknown values, as
                     llist of lists of integers
     @param boardPlot Class for plotting the board
+    @param use_trail  If True, backtrack by undoing the changes recorded on
+                      the board's trail; if False, copy the board for every
+                      value tried (the old way, kept for benchmarking)
+    @param stats  SolverStats to add the counts for this solve to, or None
+    @param inference  Names of inference rules to run along with AC-3, from
+                      inference.RULES, e.g. ('hidden_singles', 'naked_pairs')
+    @param select  How to choose the next unassigned variable: a name in
+                   get_unassigned_variable.ORDERINGS, or a function of the
+                   board; by default DEFAULT_ORDERING
+    @param order  How to order the values of the variable: a name in
+                  get_unassigned_variable.VALUE_ORDERINGS, or a function of
+                  the variable and the board; by default
+                  DEFAULT_VALUE_ORDERING
+    @param limits  limits.Limits on the time and values tried by the search,
+                   or None for no limits
     @return  The solved Sudoku grid
+    @raises GaveUp  If a limit was reached before the search finished
     """
+    if limits is not None:
+        limits.start()
 
     max_domain_val = len(original)
     board = get_board(original, max_domain_val)   # list of lists of Variables
@@ -114,12 +120,31 @@ def solve(original, boardPlot):
         return get_grid(board), False
 
     # .. Try AC-3 alone first
-    board = arc_consistency3(board, deepcopy(constraints), boardPlot)
+    start = perf_counter()
+    board = arc_consistency3(board, constraints, boardPlot, stats, inference)
+    if stats is not None:
+        stats.propagation_seconds += perf_counter() - start
     if is_complete(board):
         return get_grid(board), True
+    if board == -1:
+        boardPlot.message('Starting board is not valid.')
+        return get_grid(get_board(original, max_domain_val)), False
 
     # .. If it isn't solved, using backtracking with AC-3
-    board = backtrack(deepcopy(board), constraints, original, boardPlot)
+    start = perf_counter()
+    if use_trail:
+        board.start_trail()
+        VariableOrder(board)            # Keeps MRV and degree up to date
+    else:
+        board = board.copy()
+    try:
+        board = backtrack(board, constraints, original, boardPlot, use_trail,
+                          stats, inference, select, order, limits)
+    finally:
+        if stats is not None:
+            stats.search_seconds += perf_counter() - start
+    if board == -1:
+        return get_grid(get_board(original, max_domain_val)), False
 
     # .. Final check: check all constraints again, even the fixed ones
     constraints = get_all_constraints(max_domain_val)
@@ -134,95 +159,373 @@ def solve(original, boardPlot):
 
 
 
-def backtrack(assignment, constraints, original, boardPlot):
+def get_heuristic(heuristics, heuristic, default):
     """
-    Backtracking search algorithm
-    @param assignment
-    @param constraints
-    @param original
-    @param boardPlot  Class for plotting the board
+    Get a heuristic function
+    @param heuristics  Dictionary of the heuristics by name
+    @param heuristic  A name in heuristics, a function, or None
+    @param default  The name to use for None
+    @return  The function
+    @raises ValueError  If the name is not in heuristics
     """
+    if heuristic is None:
+        heuristic = default
+    if not isinstance(heuristic, str):
+        return heuristic
+    if heuristic not in heuristics:
+        raise ValueError('Unknown heuristic: ' + heuristic + '; choose from '
+                         + ', '.join(heuristics))
+    return heuristics[heuristic]
 
-    if is_complete(assignment):                 # Exit condition: board done!
-        return assignment
-    unasgn = get_unassigned(assignment)
-    domain = deepcopy(unasgn.get_domain())
-
-    for d in domain:
-        # Replace the domain of x with d in the assignment
-        assignment[unasgn.row][unasgn.col].replace(d)       # replace domain of x with d
 
-        boardPlot.update(get_grid(assignment), unasgn.row, unasgn.col)
-        temp_board = deepcopy(assignment)
 
-        if arc_consistency3(temp_board, deepcopy(constraints), boardPlot) != -1:
-
-            result = backtrack(temp_board, constraints, original, boardPlot)
-                                                  #   assignment is returned
-            if result != -1:                      #   If it worked:
-                return result                     #      return it to solve
+class Search:
+    """
+    Backtracking search with AC-3, driven by an explicit stack instead of
+    recursion, so the depth is not limited by Python's recursion limit and
+    the search can be stopped and carried on later.
+
+    Each frame on the stack is a list [row, col, values, pos, parent, value,
+    mark] for a variable being tried: values is its domain when it was
+    chosen, values[pos] is the next to try, parent is the board it was
+    chosen on, value is the value being tried (0 if none) and mark is the
+    mark on the trail to undo it to. Variables and values are taken in the
+    same order as by the recursive search, so the same nodes are visited
+    and the same solution is found.
+
+    The board is already arc consistent when a value is assigned, so only
+    the arcs into the assigned cell are queued for AC-3; this reaches the
+    same domains as rechecking every arc.
+
+    The search holds no reference to the board representation, so it can
+    be pickled between calls to run, to checkpoint a long solve.
+    """
+    def __init__(self, board, use_trail=True, stats=None, inference=(),
+                 select=None, order=None):
+        """
+        Set up the search
+        @param board  The board, a Board, already arc consistent. If
+                      use_trail, its trail must have been started.
+        @param use_trail  If True, undo failed values using the board's
+                          trail; otherwise copy the board for each value
+        @param stats  SolverStats to add the counts to, or None
+        @param inference  Names of inference rules to run along with AC-3
+        @param select  How to choose the next unassigned variable: a name
+                       in ORDERINGS or a function; default DEFAULT_ORDERING
+        @param order  How to order the values of the variable: a name in
+                      VALUE_ORDERINGS or a function; default
+                      DEFAULT_VALUE_ORDERING
+        """
+        self.board = board          # The board for the top of the stack
+        self.use_trail = use_trail
+        self.stats = stats
+        self.inference = inference
+        self.select = get_heuristic(ORDERINGS, select, DEFAULT_ORDERING)
+        self.order = get_heuristic(VALUE_ORDERINGS, order,
+                                   DEFAULT_VALUE_ORDERING)
+        self.stack = []
+        self.descend = True         # Choose another variable
+
+
+    def run(self, boardPlot, max_nodes=None, should_stop=None):
+        """
+        Run the search until it finds a solution, runs out of values to try,
+        or has tried max_nodes values. After a solution, run again to look
+        for the next one.
+        @param boardPlot  Class for plotting the board
+        @param max_nodes  Most values to try before pausing; None for no limit
+        @param should_stop  Function called every CHECK_EVERY values tried,
+                            that returns True to pause (e.g. at a deadline);
+                            None to never pause for it
+        @return  'solved', 'failed' or 'paused'
+        """
+        use_trail = self.use_trail
+        stats = self.stats
+        stack = self.stack
+        reverse_arcs = get_index(self.board.nside).reverse_arcs
+        nodes = 0
+        next_check = CHECK_EVERY
+
+        while True:
+            if max_nodes is not None and nodes >= max_nodes:
+                return 'paused'
+            if nodes >= next_check and should_stop is not None:
+                next_check = nodes + CHECK_EVERY
+                if should_stop():
+                    return 'paused'
+
+            if self.descend:
+                board = self.board
+                if is_complete(board):              # Exit condition
+                    self.descend = False
+                    return 'solved'
+                unasgn = self.select(board)
+                stack.append([unasgn.row, unasgn.col,
+                              self.order(unasgn, board), 0, board, 0, None])
+
+            if not stack:
+                return 'failed'
+            frame = stack[-1]
+            row, col, values, pos, parent, value, mark = frame
+
+            if value:
+                # Roll back the value and everything AC-3 and deeper levels
+                # removed
+                if use_trail:
+                    parent.undo(mark)
+                boardPlot.cell_changed(row, col, 0, 'unassign',
+                                       self.board.get_grid)
+                self.board = parent
+                frame[5] = 0
+
+            if pos == len(values):
+                stack.pop()                         # Fail
+                self.descend = False
+                continue
+
+            # Replace the domain of x with the next value in the assignment
+            value = values[pos]
+            frame[3] = pos + 1
+            frame[5] = value
+            if use_trail:
+                frame[6] = parent.mark()
+            nodes += 1
+            if stats is not None:
+                stats.nodes += 1
+            parent[row][col].replace(value)
+            boardPlot.cell_changed(row, col, value, 'assign', parent.get_grid)
+
+            if use_trail:
+                # AC-3 changes the board, and the changes are undone above
+                temp_board = parent
+            else:
+                temp_board = parent.copy()          # copies the domain list
+            self.board = temp_board
+            arcs = reverse_arcs[row * parent.nside + col]
+            self.descend = arc_consistency3(temp_board, arcs, boardPlot, stats,
+                                            self.inference) != -1
 
 
-        # The is no need to remove d from domain, because the next time
-        # around we will just reset it, and if we run out of values, we
-        # will return FAIL (-1)
-        # assignment[x.row,x.col] = d             #   remove d from domain
-        # But we do need it for the graphics
-        boardPlot.update(get_grid(temp_board), unasgn.row, unasgn.col)
 
+def backtrack(assignment, constraints, original, boardPlot, use_trail=True,
+              stats=None, inference=(), select=None, order=None, limits=None):
+    """
+    Backtracking search algorithm
+    @param assignment  The board, a Board, already arc consistent
+    @param constraints  Not used: only the arcs into each assigned cell
+                        need to be checked again
+    @param original
+    @param boardPlot  Class for plotting the board
+    @param use_trail  If True, undo failed branches using the board's trail,
+                      which must have been started; otherwise copy the
+                      board for each value tried
+    @param stats  SolverStats to add the counts to, or None
+    @param inference  Names of inference rules to run along with AC-3
+    @param select  How to choose the next unassigned variable
+    @param order  How to order the values of the variable
+    @param limits  limits.Limits for the search, or None for no limits; the
+                   clock must have been started
+    @return  The solved board, or -1 if it cannot be solved
+    @raises GaveUp  If a limit was reached before the search finished
+    """
+    search = Search(assignment, use_trail, stats, inference, select, order)
+    if limits is None:
+        status = search.run(boardPlot)
+    else:
+        status = search.run(boardPlot, limits.max_nodes, limits.should_stop)
+    if status == 'paused':
+        # .. Cells AC-3 had just emptied are shown as unassigned
+        raise limits.give_up([[max(val, 0) for val in row]
+                              for row in get_grid(search.board)])
+    if status == 'solved':
+        return search.board
     return -1   # Fail
 
 
 
-def arc_consistency3(assignment, constraints, boardPlot):
+def iter_solutions(original, boardPlot, limit=None, stats=None, inference=(),
+                   select=None, order=None):
     """
-    arc_consistency3
-    @param assignment
-    @param constraints
-    @param boardPlot
+    Find the solutions of a Sudoku puzzle, one at a time. The search carries
+    on from where it found the last solution, so nothing is redone.
+    @param original  Starting grid, with zeros for unknown values, as
+                     list of lists of integers
+    @param boardPlot  Class for plotting the board
+    @param limit  Most solutions to find, e.g. 2 to check that there is
+                  only one; None for all of them
+    @param stats  SolverStats to add the counts to, or None
+    @param inference  Names of inference rules to run along with AC-3
+    @param select  How to choose the next unassigned variable
+    @param order  How to order the values of the variable
+    @return  Generator of solved grids, list of lists
     """
+    if limit is not None and limit < 1:
+        return
+    board = get_board(original, len(original))
+    constraints, success = qc_board_and_constraints(
+        board, get_all_constraints(len(original)))
+    if not success:
+        boardPlot.message('Starting board is not valid.')
+        return
+    board = arc_consistency3(board, constraints, boardPlot, stats, inference)
+    if board == -1:
+        return
+    if is_complete(board):
+        yield get_grid(board)
+        return
 
-    while constraints:
-        [irow, icol], [jrow, jcol] = constraints.pop(0)
-        xi = assignment[irow][icol]
-        xj = assignment[jrow][jcol]
+    board.start_trail()
+    VariableOrder(board)
+    search = Search(board, True, stats, inference, select, order)
+    found = 0
+    while search.run(boardPlot) == 'solved':
+        yield get_grid(search.board)
+        found += 1
+        if found == limit:
+            return
 
-        # .. Check if xi is fixed. It shouldn't be because we already removed
-        #    it from the constraints
-        if xi.fixed:
-            continue
 
-        if remove_values(xi, xj, get_grid(assignment), boardPlot):
-            # .. Removed a value from domain of xi based on constraint with xj.
-            #    Return FAIL if nothing is left in the domain of x.
-            #    Then we need to check every variable that xi has a constraint
-            #    with, to see if those constraints are still satisfied or if
-            #    we can simplifiy their domains based on the new domain of xi.
-            #    Example: If xi has a constraint with some xk:
-            #       - If the domain of xi is now {3}, and the domain of xk is
-            #         also {3}, then return FAIL so we can back up.
-            #       - If the domain of xi is now {3}, and the domain of xk is
-            #         {1,3}, we will be able to reduce the domain of xk to {1}
-            #    But note that those may already be on the queue, so now
-            #    they'll be looped over twice.
-            #    Those will be done in another loop around. For now, just
-            #    add them to the queue
-            if xi.get_domain_size() == 0:
-                # CSP cannot be solved
-                return -1
-            new_constraints = reverse_constraints(xi.row, xi.col, xi.max_domain_val)
-            constraints += new_constraints
 
-    return assignment
+def count_solutions(original, limit=None, stats=None, inference=()):
+    """
+    Count the solutions of a Sudoku puzzle, with no graphics
+    @param original  Starting grid, with zeros for unknown values
+    @param limit  Stop counting here; e.g. with 2, the count is 1 only if
+                  the puzzle has a unique solution
+    @param stats  SolverStats to add the counts to, or None
+    @param inference  Names of inference rules to run along with AC-3
+    @return  The number of solutions found, at most limit
+    """
+    return sum(1 for grid in iter_solutions(original, NullBoard(), limit,
+                                            stats, inference))
 
 
 
-def remove_values(xi, xj, tempgrid, boardPlot):
+def arc_consistency3(assignment, constraints, boardPlot, stats=None,
+                     inference=()):
+    """
+    arc_consistency3, followed by any inference rules, until neither can
+    remove another value
+    @param assignment  The board, a Board
+    @param constraints  The arcs (i, j) to check, list of tuples of cell ids.
+                        The list is not modified.
+    @param boardPlot
+    @param stats  SolverStats to add the arc counts to, or None
+    @param inference  Names of inference rules (see inference.RULES) to run
+                      each time the arc queue is empty
+    """
+    domains = assignment.domains
+    fixed = assignment.fixed
+    ncells = assignment.ncells
+    peers = get_index(assignment.nside).peers
+
+    # .. The queue holds arc (i, j) as the key i * ncells + j, and queued
+    #    says whether a key is on the queue, so an arc is never on it twice.
+    #    queued is made once for the board, and cleared as arcs come off the
+    #    queue
+    queue = deque()
+    queued = assignment.arc_queued
+    if queued is None:
+        queued = assignment.arc_queued = bytearray(ncells * ncells)
+    processed = 0
+    revisions = 0
+    duplicates = 0
+
+    for i, j in constraints:
+        key = i * ncells + j
+        if queued[key]:
+            duplicates += 1
+        else:
+            queued[key] = 1
+            queue.append(key)
+
+    result = assignment
+    while True:
+        while queue:
+            key = queue.popleft()
+            queued[key] = 0
+            processed += 1
+            i, j = divmod(key, ncells)
+
+            # .. Check if xi is fixed. It shouldn't be because we already
+            #    removed it from the constraints
+            if fixed[i]:
+                continue
+
+            if remove_values(assignment, i, j, boardPlot):
+                # .. Removed a value from domain of xi based on constraint
+                #    with xj. Return FAIL if nothing is left in the domain of
+                #    x. If only one value is left, we need to check every
+                #    variable that xi has a constraint with, to see if those
+                #    constraints are still satisfied or if we can simplifiy
+                #    their domains based on the new domain of xi.
+                #    Example: If xi has a constraint with some xk:
+                #       - If the domain of xi is now {3}, and the domain of xk
+                #         is also {3}, then return FAIL so we can back up.
+                #       - If the domain of xi is now {3}, and the domain of xk
+                #         is {1,3}, we will be able to reduce the domain of xk
+                #         to {1}
+                #    While xi has two or more values, the arcs into it cannot
+                #    remove anything (see remove_values), so they are only
+                #    queued once it is down to one value.
+                #    Arcs that are already on the queue are not added again:
+                #    when they come off, they will see the new domain of xi.
+                revisions += 1
+                mask = domains[i]
+                if mask == 0:
+                    # CSP cannot be solved
+                    result = -1
+                    break
+                if mask & (mask - 1):
+                    continue
+                for k in peers[i]:
+                    key = k * ncells + i
+                    if queued[key]:
+                        duplicates += 1
+                    else:
+                        queued[key] = 1
+                        queue.append(key)
+
+        if result == -1 or not inference:
+            break
+
+        # .. The arcs are consistent; see if the inference rules can do more,
+        #    and if so, recheck the arcs into every cell they left with one
+        #    value
+        changed = apply_inference(assignment, inference, boardPlot, stats)
+        if changed == -1:
+            result = -1
+            break
+        if not changed:
+            break
+        for i in changed:
+            mask = domains[i]
+            if mask & (mask - 1):
+                continue
+            for k in peers[i]:
+                key = k * ncells + i
+                if not queued[key]:
+                    queued[key] = 1
+                    queue.append(key)
+
+    # .. Clear the arcs left on the queue after a failure, for the next call
+    for key in queue:
+        queued[key] = 0
+
+    if stats is not None:
+        stats.arcs_processed += processed
+        stats.revisions += revisions
+        stats.duplicates_avoided += duplicates
+    return result
+
+
+
+def remove_values(assignment, i, j, boardPlot):
     """
     Remove values from the domain
-    @param xi
-    @param xj
-    @param tempgrid
+    @param assignment  The board, a Board
+    @param i  Index to the cell xi whose domain may shrink
+    @param j  Index to the cell xj it must differ from
     @param boardPlot
     """
     modified = False
@@ -231,17 +534,20 @@ def remove_values(xi, xj, tempgrid, boardPlot):
     # and the domain of x is not fixed.
     # (If x and y are both fixed and equal, that should have been caught
     # previously)
-    if xj.get_domain_size() == 1:
-        q = xj.get_only_value()
-        if q in xi.domain:
-            # Remove p from Dx.
-            # Note: xi points to an element of assignment, so this will also
-            # remove p from xi in assignment.
-            xi.remove(q)
-
-            # Update graphics
-            if xi.get_domain_size() == 1:
-                tempgrid[xi.row][xi.col] = xi.get_only_value()
-                boardPlot.update(tempgrid)
+    qmask = assignment.domains[j]
+    if qmask and not qmask & (qmask - 1):
+        pmask = assignment.domains[i]
+        if pmask & qmask:
+            # Remove q from Dx. This goes through the board so that it is
+            # recorded on the trail, if there is one.
+            pmask ^= qmask
+            assignment.set_domain(i, pmask)
+
+            # Update graphics; the grid is only built if boardPlot needs it
+            if pmask and not pmask & (pmask - 1):
+                nside = assignment.nside
+                boardPlot.cell_changed(i // nside, i % nside,
+                                       pmask.bit_length(), 'propagate',
+                                       assignment.get_grid)
             modified = True
     return modified
@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 09:12:40 2026
+
+Counters collected while solving, so runs can be compared
+"""
+
+
+class SolverStats:
+    """
+    Counters for one or more solves. Pass an instance to the solver and
+    read the counters afterwards.
+    """
+    def __init__(self):
+        """Start all counters at zero"""
+        self.arcs_processed = 0         # Arcs taken off the AC-3 queue
+        self.revisions = 0              # Arcs that removed a value
+        self.duplicates_avoided = 0     # Arcs not queued; already there
+        self.nodes = 0                  # Values tried by the search
+        self.hidden_singles = 0         # Cells changed by each inference rule
+        self.naked_pairs = 0
+        self.hidden_pairs = 0
+        self.propagation_seconds = 0.0  # Time in the first AC-3, by solve
+        self.search_seconds = 0.0       # Time in the search, by solve
+
+
+    def as_dict(self):
+        """
+        Get the counters
+        @return  Dictionary of counter name: value
+        """
+        return dict(vars(self))
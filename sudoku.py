@@ -19,17 +19,16 @@ Spring 2021
 
 """
 # Built-in modules
-import sys
+import argparse
 from os.path import exists
-from numpy import loadtxt
 
 # Sudoku modules
-from backtrack import backtracker                      # Backtrack
-from solver import solve                               # Backtrack + AC-3
-from board_plotter import BoardPlot                    # Include graphics
+from puzzle_io import open_puzzle_file, read_puzzles
+from registry import default_inference, get, get_options, names
 
-# For debugging, use this instead of the above to turn off graphics
-#from board_plotter import BoardPrint as BoardPlot      # No graphics
+# The engines, heuristics and board representations are chosen by name
+# from the registry. The board plotter only imports matplotlib when the
+# board is actually displayed
 
 def load_starting_vals(filename=''):
     """
@@ -56,18 +55,29 @@ def load_starting_vals(filename=''):
     if not exists(filename):
         raise NameError('Puzzle file: ' + filename + ' not found.')
 
-    grid = [[0 for i in range(9)] for j in range(9)]
-    orig_vals = loadtxt(filename, dtype=int, ndmin=2)
-    for row in orig_vals:
-        grid[int(row[0]-1)][int(row[1]-1)] = int(row[2])
+    with open_puzzle_file(filename) as puzzlefile:
+        grid = next(read_puzzles(puzzlefile), None)
+    if grid is None:
+        # No values in the file
+        grid = [[0 for i in range(9)] for j in range(9)]
 
     return grid
 
 
-def main(filename='', technique=''):
+def main(filename='', technique='', ordering=None, value_ordering=None,
+         sink='plot'):
     """Run Sudoku solver
     filename  Filename to run, string
-    technique  Technique to use. If not 'backtrack', will use backtrack + AC-3
+    technique  Technique to use: 'backtrack', 'dlx' (Dancing Links), or
+               anything else for backtrack + AC-3 (or any other engine
+               in the registry, see registry.py). For 16x16 and 25x25
+               boards, backtrack + AC-3 runs every inference rule too.
+    ordering  Name of the heuristic for choosing the next variable, for
+              backtrack + AC-3; None for the default
+    value_ordering  Name of the heuristic for ordering its values, for
+                    backtrack + AC-3; None for the default
+    sink  How to show the board: 'plot' (graphics), 'print' (standard
+          output, for debugging) or 'null' (nothing)
 
     sample inputs
     technique = 'both'
@@ -84,29 +94,42 @@ def main(filename='', technique=''):
     filename = filenames[8]
     """
 
-
-    if technique == 'backtrack':
-        solver = backtracker
-    else:
-        solver = solve
-
     # Set up the board
     originalgrid = load_starting_vals(filename)
-    boardPlot = BoardPlot(originalgrid, technique)
+
+    if technique not in names('engine'):
+        technique = 'ac3'
+    solver = get('engine', technique)
+    inference = ()
+    if technique == 'ac3':
+        inference = default_inference(len(originalgrid))
+    options = get_options(technique, ordering, value_ordering, inference)
+    boardPlot = get('sink', sink)(originalgrid, technique)
 
     # Solve the sudoku board using Backtracking or AC-3 and Backtracking
-    _, success = solver(originalgrid, boardPlot)
+    _, success = solver(originalgrid, boardPlot, **options)
 
     # Pause the plot for a bit
     boardPlot.finish(success)
 
 
 if __name__ == '__main__':
-    if len(sys.argv) == 1:
-        main()
-    elif len(sys.argv) == 2:
-        main(sys.argv[1])
-    elif len(sys.argv) == 3:
-        main(sys.argv[1], sys.argv[2])
-    else:
-        raise ValueError('Please include 0-2 inputs, optionally filename and technique')
+    parser = argparse.ArgumentParser(description='Solve a Sudoku puzzle '
+                                     'and show the board as it goes.')
+    parser.add_argument('filename', nargs='?', default='',
+                        help='puzzle file; by default a built-in puzzle')
+    parser.add_argument('technique', nargs='?', default='',
+                        help='engine: ' + ', '.join(names('engine'))
+                        + '; default ac3')
+    parser.add_argument('--ordering', choices=names('ordering'),
+                        help='heuristic for the next variable (ac3 only)')
+    parser.add_argument('--values', choices=names('value_ordering'),
+                        help='heuristic for the order of its values '
+                        '(ac3 only)')
+    parser.add_argument('--sink', choices=names('sink'), default='plot',
+                        help='how to show the board; default plot')
+    args = parser.parse_args()
+    if (args.ordering or args.values) \
+      and args.technique in names('engine') and args.technique != 'ac3':
+        parser.error('--ordering and --values only apply to ac3')
+    main(args.filename, args.technique, args.ordering, args.values, args.sink)
@@ -6,7 +6,45 @@ Created on Sun Jan 23 19:52:42 2022
 @author: prowe
 """
 
-from backtrack import getsquarevals
+import multiprocessing
+import os
+import pickle
+import subprocess
+import sys
+import threading
+from copy import deepcopy
+from io import StringIO
+
+import pytest
+
+import backtrack
+import registry
+import solver
+from backtrack import backtracker, get_occupancy, getsquarevals
+from batch import read_files, solve_all, solve_parallel, solve_puzzle
+from batch import main as batch_main
+from benchmark import compare, percentile, run_benchmark
+from benchmark import main as benchmark_main
+from cache import SolveCache, canonical_form, transform_grid, untransform_grid
+from board_plotter import NullBoard
+from dlx import dancing_links
+from constraints import get_all_constraints, get_index
+from constraints import find_conflict, qc_board_and_constraints
+from corpus import Corpus, is_corpus, write_corpus
+from corpus import main as corpus_main
+from generator import EVIL_NODES, generate, grade
+from get_unassigned_variable import VariableOrder, get_constraints_for_x
+from get_unassigned_variable import get_unassigned_using_mrv_and_degree
+from get_unassigned_variable import get_ascending_values
+from get_unassigned_variable import get_least_constraining_values
+from inference import RULES, hidden_pairs, hidden_singles, naked_pairs
+from limits import GaveUp, Limits
+from puzzle_io import grid_to_line, line_to_grid, read_puzzles
+from puzzle_io import open_puzzle_file, read_fixed_width, read_records
+from puzzle_io import write_puzzles
+from solver import arc_consistency3, get_board, solve
+from stats import SolverStats
+from variable import Board, Variable, values_to_mask
 
 def test_getsquarevals():
     """Test of getsquarevals"""
@@ -55,3 +93,785 @@ def test_getsquarevals():
     for i in range(3, 6):
         for j in range(6, 9):
             assert(getsquarevals(grid, i, j)) == [8, 4, 7, 0, 4, 8, 8, 2, 8]
+
+
+def test_board_bitmask_domains():
+    """Test that Variable views read and write the Board's bitmasks"""
+    board = Board(9)
+    board.fix(0, 0, 5)
+    cell = board[0][1]
+    assert board[0][0].fixed and not cell.fixed
+    assert board[0][0].get_only_value() == 5
+    assert cell.get_domain_size() == 9
+
+    cell.remove(5)
+    cell.remove(9)
+    assert cell.get_domain() == {1, 2, 3, 4, 6, 7, 8}
+    assert board.domains[1] == 0b011101111
+    cell.get_domain().discard(1)
+    assert cell.contains(1) and cell.mask == 0b011101111
+
+    copied = board.copy()
+    copied[0][1].replace(3)
+    assert copied[0][1].get_only_value() == 3
+    assert cell.get_domain_size() == 7
+    assert copied.get_grid()[0][:3] == [5, 3, 0]
+
+    var = Variable(0, 0, 9)
+    var.remove(1)
+    assert var.get_domain_size() == 8 and not var.contains(1)
+
+
+MEDIUM = [[0, 0, 2, 0, 0, 9, 0, 0, 0],
+          [0, 3, 0, 8, 0, 1, 2, 0, 0],
+          [1, 0, 0, 0, 0, 0, 0, 0, 9],
+          [0, 2, 5, 0, 0, 0, 4, 0, 0],
+          [0, 7, 0, 0, 0, 0, 8, 0, 2],
+          [0, 0, 0, 6, 0, 0, 9, 3, 0],
+          [8, 0, 0, 5, 2, 0, 0, 0, 0],
+          [0, 0, 0, 3, 4, 0, 6, 0, 0],
+          [0, 0, 0, 0, 0, 7, 0, 0, 0]]
+
+
+def test_trail_matches_copy():
+    """Test that undoing with the trail finds the same solution as copying"""
+    grid_trail, success_trail = solve(deepcopy(MEDIUM), NullBoard())
+    grid_copy, success_copy = solve(deepcopy(MEDIUM), NullBoard(),
+                                    use_trail=False)
+    assert success_trail and success_copy
+    assert grid_trail == grid_copy
+
+
+def test_board_undo():
+    """Test that undo restores the domains changed since the mark"""
+    board = Board(9)
+    board.start_trail()
+    board[0][0].remove(3)
+    mark = board.mark()
+    board[0][0].replace(5)
+    board[4][4].remove(9)
+    board.undo(mark)
+    assert board[0][0].get_domain() == {1, 2, 4, 5, 6, 7, 8, 9}
+    assert board[4][4].get_domain_size() == 9
+
+
+def test_constraint_index():
+    """Test the peers, units and arcs of the shared constraint index"""
+    index = get_index(9)
+    assert index is get_index(9)
+    assert len(index.units) == 27
+    assert all(len(cell_peers) == 20 for cell_peers in index.peers)
+    assert len(index.arcs) == 81 * 20
+
+    # Cell (4, 4) is the centre of the middle box
+    peers = set(index.peers[40])
+    assert {36, 44, 4, 76, 30, 50} <= peers
+    assert 40 not in peers and 0 not in peers
+    assert index.cell_units[40][2] == (30, 31, 32, 39, 40, 41, 48, 49, 50)
+    assert all((j, 40) in index.reverse_arcs[40] for j in peers)
+
+
+def test_arc_consistency_counters():
+    """Test that AC-3 counts its work and leaves the arc list alone"""
+    board = get_board(MEDIUM)
+    constraints, _ = qc_board_and_constraints(board, get_all_constraints(9))
+    ninitial = len(constraints)
+    stats = SolverStats()
+    arc_consistency3(board, constraints, NullBoard(), stats)
+    assert len(constraints) == ninitial
+    assert stats.arcs_processed >= ninitial
+    assert 0 < stats.revisions <= stats.arcs_processed
+    assert stats.duplicates_avoided > 0
+    assert not any(board.arc_queued)
+
+    # .. The scratch space is reused, and left clear after a failure too
+    queued = board.arc_queued
+    grid = deepcopy(MEDIUM)
+    grid[0][:] = [1, 2, 3, 4, 5, 6, 7, 8, 0]
+    grid[1][8] = 9
+    board = get_board(grid)
+    board.arc_queued = queued
+    assert arc_consistency3(board, get_all_constraints(9), NullBoard()) == -1
+    assert board.arc_queued is queued and not any(queued)
+
+
+def test_cell_changed_events():
+    """Test that the solver reports changes without building grids"""
+    events = []
+
+    class Recorder(NullBoard):
+        """Records each change, but never asks for the grid"""
+        def cell_changed(self, row, col, value, kind, get_grid):
+            events.append((row, col, value, kind))
+
+        def update(self, grid, xpos=-1, ypos=-1):
+            raise AssertionError('update should not be called')
+
+    grid, success = solve(deepcopy(MEDIUM), Recorder())
+    assert success
+    kinds = {kind for _, _, _, kind in events}
+    assert kinds <= {'assign', 'unassign', 'propagate'}
+    assert 'propagate' in kinds and 'assign' in kinds
+    for row, col, value, kind in events:
+        assert kind == 'unassign' or 1 <= value <= 9
+
+
+def test_read_puzzles():
+    """Test reading puzzles in both formats from one stream"""
+    line = grid_to_line(MEDIUM)
+    assert len(line) == 81 and line.startswith('..2..9...')
+    assert line_to_grid(line) == MEDIUM
+
+    lines = ['1 3 2\n', '1 6 9\n', '\n', line + '\n', '# comment\n',
+             '9 9 1\n']
+    grids = list(read_puzzles(lines))
+    assert len(grids) == 3
+    assert grids[0][0] == [0, 0, 2, 0, 0, 9, 0, 0, 0]
+    assert grids[1] == MEDIUM
+    assert grids[2][8][8] == 1
+
+
+def test_batch_solve_puzzle():
+    """Test solving one puzzle headless, with both techniques"""
+    for technique in ['ac3', 'backtrack']:
+        status, grid, seconds, stats = solve_puzzle(deepcopy(MEDIUM),
+                                                    technique)
+        assert status == 'solved'
+        assert all(sorted(row) == list(range(1, 10)) for row in grid)
+        assert seconds > 0 and stats.nodes > 0
+
+
+def test_batch_invalid_givens():
+    """Test that every engine reports a board with duplicate givens"""
+    grid = deepcopy(MEDIUM)
+    grid[0] = [0] * 9
+    grid[0][0] = grid[0][8] = 5
+    assert find_conflict(grid) == (0, 8)
+    assert find_conflict(MEDIUM) is None
+    for technique in ['ac3', 'backtrack', 'dlx']:
+        status, board, seconds, stats = solve_puzzle(deepcopy(grid),
+                                                     technique)
+        assert status == 'invalid'
+        assert stats.nodes == 0
+
+    # .. Inference and heuristics only apply to ac3
+    with pytest.raises(ValueError):
+        solve_puzzle(deepcopy(MEDIUM), 'dlx', inference=tuple(RULES))
+    with pytest.raises(SystemExit):
+        batch_main(['--technique', 'dlx', '--inference', 'all'])
+
+
+def test_batch_solve_parallel():
+    """Test that the process pool gives the same results as one process"""
+    puzzles = [MEDIUM, line_to_grid('.' * 81), MEDIUM]
+    serial = [line.split('\t')[:3] for line in solve_all(deepcopy(puzzles))]
+    ordered = [line.split('\t')[:3]
+               for line in solve_parallel(deepcopy(puzzles), workers=2,
+                                          chunksize=1)]
+    unordered = [line.split('\t')[:3]
+                 for line in solve_parallel(deepcopy(puzzles), workers=2,
+                                            chunksize=2, ordered=False)]
+    assert ordered == serial
+    assert sorted(unordered) == sorted(serial)
+
+
+def test_core_imports_standard_library_only():
+    """Test that solving headless never imports numpy or matplotlib"""
+    code = ('import sys\n'
+            'import sudoku, batch\n'
+            'grid = sudoku.load_starting_vals("puzzles/easy.puzz")\n'
+            'assert batch.solve_puzzle(grid)[0] == "solved"\n'
+            'assert "numpy" not in sys.modules\n'
+            'assert "matplotlib" not in sys.modules\n')
+    subprocess.run([sys.executable, '-c', code], check=True,
+                   cwd=os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_inference_rules():
+    """Test the unit-based inference rules, alone and inside AC-3"""
+    units = get_index(9).units
+
+    # .. 5 can only go in the first cell of the first row
+    board = Board(9)
+    for i in range(1, 9):
+        board.domains[i] &= ~0b10000
+    assert hidden_singles(board, units) == {0}
+    assert board[0][0].get_only_value() == 5
+
+    # .. A naked pair {1, 2} in the first row
+    board = Board(9)
+    board.domains[0] = board.domains[1] = 0b11
+    assert 2 in naked_pairs(board, units)
+    assert board[0][2].get_domain() == {3, 4, 5, 6, 7, 8, 9}
+    assert board[0][0].get_domain() == {1, 2}
+
+    # .. A hidden pair {8, 9}, which can only go in the first two cells
+    board = Board(9)
+    for i in range(2, 9):
+        board.domains[i] &= ~0b110000000
+    assert hidden_pairs(board, units) == {0, 1}
+    assert board[0][1].get_domain() == {8, 9}
+
+    # .. Solving with inference should need fewer values tried
+    plain = SolverStats()
+    inferred = SolverStats()
+    solve(deepcopy(MEDIUM), NullBoard(), stats=plain)
+    solve(deepcopy(MEDIUM), NullBoard(), stats=inferred,
+          inference=tuple(RULES))
+    assert inferred.nodes < plain.nodes
+    assert inferred.hidden_singles > 0
+
+
+def test_dancing_links():
+    """Test the exact cover solver on a valid and an invalid board"""
+    stats = SolverStats()
+    grid, success = dancing_links(deepcopy(MEDIUM), NullBoard(), stats)
+    assert success and stats.nodes > 0
+    for irow in range(9):
+        assert sorted(grid[irow]) == list(range(1, 10))
+        assert sorted(row[irow] for row in grid) == list(range(1, 10))
+        assert sorted(getsquarevals(grid, irow // 3 * 3, irow % 3 * 3)) \
+            == list(range(1, 10))
+        assert all(grid[irow][icol] == MEDIUM[irow][icol]
+                   for icol in range(9) if MEDIUM[irow][icol])
+
+    bad = deepcopy(MEDIUM)
+    bad[8][8] = 2                   # Already in the last column
+    assert dancing_links(bad, NullBoard()) == (bad, False)
+
+
+def test_variable_order_matches_scan():
+    """Test that the incremental MRV/degree order agrees with the scan"""
+    board = get_board(MEDIUM)
+    board.start_trail()
+    arc_consistency3(board, get_all_constraints(9), NullBoard())
+    scanned = get_unassigned_using_mrv_and_degree(board)
+    VariableOrder(board)
+    chosen = get_unassigned_using_mrv_and_degree(board)
+    assert (chosen.row, chosen.col) == (scanned.row, scanned.col)
+
+    mark = board.mark()
+    chosen.replace(chosen.get_domain().pop())
+    arc_consistency3(board, get_all_constraints(9), NullBoard())
+    order = board.watcher
+    board.watcher = None
+    scanned = get_unassigned_using_mrv_and_degree(board)
+    board.watcher = order
+    chosen = get_unassigned_using_mrv_and_degree(board)
+    assert (chosen.row, chosen.col) == (scanned.row, scanned.col)
+
+    board.undo(mark)
+    assert order.degree == [get_constraints_for_x(board[i // 9][i % 9], board)
+                            for i in range(81)]
+
+
+def test_sixteen_by_sixteen():
+    """Test loading and solving a 16x16 board with every technique"""
+    nside = 16
+    solution = [[(4 * (row % 4) + row // 4 + col) % nside + 1
+                 for col in range(nside)] for row in range(nside)]
+    puzzle = deepcopy(solution)
+    for cell in range(0, nside * nside, 3):
+        puzzle[cell // nside][cell % nside] = 0
+
+    line = grid_to_line(puzzle)
+    assert len(line) == 256 and 'A' in line
+    assert line_to_grid(line) == puzzle
+    assert list(read_puzzles(['16 16 16\n']))[0][15][15] == 16
+
+    peers = get_index(nside).peers
+    for solver in (solve, dancing_links, backtracker):
+        grid, success = solver(deepcopy(puzzle), NullBoard())
+        assert success
+        values = [val for row in grid for val in row]
+        assert all(values[cell] != values[peer]
+                   for cell in range(nside * nside) for peer in peers[cell])
+        assert all(puzzle[irow][icol] in (0, grid[irow][icol])
+                   for irow in range(nside) for icol in range(nside))
+
+
+def test_occupancy_bitmasks():
+    """Test the used-value bitmasks for the rows, columns and boxes"""
+    rows, cols, boxes = get_occupancy(MEDIUM)
+    assert rows[0] == 1 << 1 | 1 << 8
+    assert cols[2] == 1 << 1 | 1 << 4
+    assert boxes[0] == 1 << 0 | 1 << 1 | 1 << 2
+    for row in range(9):
+        for col in range(9):
+            if MEDIUM[row][col]:
+                bit = 1 << MEDIUM[row][col] - 1
+                assert rows[row] & cols[col] & boxes[row // 3 * 3 + col // 3] & bit
+
+    stats = SolverStats()
+    grid, success = backtracker(deepcopy(MEDIUM), NullBoard(), stats)
+    assert success and stats.nodes == 5322
+    assert get_occupancy(grid) == ([511] * 9, [511] * 9, [511] * 9)
+
+
+def test_search_pause_and_resume():
+    """Test that both searches can be paused, pickled and carried on"""
+    grid, success = backtracker(deepcopy(MEDIUM), NullBoard())
+    search = backtrack.Search(deepcopy(MEDIUM), SolverStats())
+    status = search.run(NullBoard(), max_nodes=1000)
+    while status == 'paused':
+        search = pickle.loads(pickle.dumps(search))
+        status = search.run(NullBoard(), max_nodes=1000)
+    assert status == 'solved' and search.grid == grid
+    assert search.stats.nodes == 5322
+
+    stats = SolverStats()
+    grid, success = solve(deepcopy(MEDIUM), NullBoard(), stats=stats)
+    board = get_board(MEDIUM)
+    constraints, success = qc_board_and_constraints(board,
+                                                    get_all_constraints(9))
+    arc_consistency3(board, constraints, NullBoard())
+    board.start_trail()
+    VariableOrder(board)
+    search = solver.Search(board, stats=SolverStats())
+    status = search.run(NullBoard(), max_nodes=5)
+    while status == 'paused':
+        search = pickle.loads(pickle.dumps(search))
+        status = search.run(NullBoard(), max_nodes=5)
+    assert status == 'solved' and search.board.get_grid() == grid
+    assert search.stats.nodes == stats.nodes
+
+
+def test_iter_solutions():
+    """Test finding every solution, and stopping early at a limit"""
+    grid = deepcopy(MEDIUM)
+    solutions = list(solver.iter_solutions(grid, NullBoard()))
+    assert grid == MEDIUM
+    assert len(solutions) == 48 and len(set(map(str, solutions))) == 48
+    assert sorted(solutions) == sorted(backtrack.iter_solutions(grid,
+                                                                NullBoard()))
+    assert solver.count_solutions(MEDIUM, limit=2) == 2
+    assert len(list(backtrack.iter_solutions(MEDIUM, NullBoard(), 2))) == 2
+
+    with open(os.path.join(os.path.dirname(__file__), 'puzzles',
+                           'hard.puzz')) as puzzlefile:
+        hard = next(read_puzzles(puzzlefile))
+    assert solver.count_solutions(hard, limit=2) == 1
+    assert solver.count_solutions(hard, 2, inference=tuple(RULES)) == 1
+
+
+def test_generator():
+    """Test that generated puzzles are unique, graded and reproducible"""
+    assert grade(MEDIUM) is None                # 48 solutions
+    with open(os.path.join(os.path.dirname(__file__), 'puzzles',
+                           'easy.puzz')) as puzzlefile:
+        assert grade(next(read_puzzles(puzzlefile))) == 'easy'
+
+    # .. Puzzles that need the search are graded by the values it tries
+    grids = {}
+    for name in ('evil', 'puzzle1'):
+        with open(os.path.join(os.path.dirname(__file__), 'puzzles',
+                               name + '.puzz')) as puzzlefile:
+            grids[name] = next(read_puzzles(puzzlefile))
+    stats = SolverStats()
+    assert grade(grids['evil'], stats) == 'evil'
+    assert 0 < stats.nodes <= EVIL_NODES
+    stats = SolverStats()
+    assert grade(grids['puzzle1'], stats) == 'diabolical'
+    assert stats.nodes > EVIL_NODES
+    assert grade(grids['puzzle1'], hardest='evil') is None
+
+    puzzles = list(generate(2, 'medium', seed=5))
+    assert puzzles == list(generate(2, 'medium', seed=5, workers=2,
+                                    chunksize=1))
+    assert puzzles != list(generate(2, 'medium', seed=6))
+    for line in puzzles:
+        grid = line_to_grid(line)
+        assert grade(grid) == 'medium'
+        assert solver.count_solutions(grid, limit=2) == 1
+
+
+def test_benchmark():
+    """Test the benchmark summaries and the comparison with a baseline"""
+    assert percentile([4, 1, 3, 2], 50) == 2
+    assert percentile([4, 1, 3, 2], 95) == 4
+    assert percentile(list(range(1, 101)), 99) == 99
+
+    report = run_benchmark([('medium', MEDIUM)], ['ac3', 'dlx'])
+    summary = report['configs']['ac3']['summary']
+    assert summary['solved'] == 1 and summary['nodes'] > 0
+    assert summary['revisions'] > 0 and summary['peak_kb'] > 0
+    assert report['configs']['ac3']['puzzles'][0]['puzzle'] == 'medium'
+    assert compare(report, report) == []
+
+    baseline = deepcopy(report)
+    baseline['configs']['dlx']['summary']['nodes'] -= 1
+    summary = report['configs']['ac3']['summary']
+    slowest = baseline['configs']['ac3']['summary']['slowest']
+    assert summary['slowest']['total_ms'] >= summary['total_ms']
+
+    # .. Times are compared with the slowest of the baseline's repeats
+    summary['p50_ms'] = slowest['p50_ms'] * 1.05 + 2
+    summary['p95_ms'] = slowest['p95_ms'] + 0.5
+    summary['p99_ms'] = slowest['p99_ms']
+    regressions = compare(baseline, report)
+    assert len(regressions) == 2
+    assert regressions[0].startswith('ac3: p50_ms')
+    assert regressions[1].startswith('dlx: nodes')
+    with pytest.raises(SystemExit):
+        benchmark_main(['--level', 'impossible'])
+
+
+def test_registry():
+    """Test choosing the engines, heuristics and sinks by name"""
+    assert registry.names('engine') == ['ac3', 'backtrack', 'dlx']
+    assert 'mrv_degree' in registry.names('ordering')
+    assert registry.get('sink') is NullBoard
+
+    for ordering in registry.names('ordering'):
+        stats = SolverStats()
+        grid, success = registry.solve_with(deepcopy(MEDIUM), 'ac3', ordering,
+                                            'domain', stats=stats)
+        assert success and stats.nodes > 0
+    with pytest.raises(ValueError):
+        registry.get('ordering', 'no_such_heuristic')
+    with pytest.raises(ValueError):
+        registry.solve_with(deepcopy(MEDIUM), 'dlx', ordering='mrv')
+    assert registry.default_inference(9) == ()
+    assert registry.default_inference(25) == tuple(RULES)
+    status, grid, seconds, stats = solve_puzzle(deepcopy(MEDIUM),
+                                                inference=None)
+    assert status == 'solved' and stats.hidden_singles == 0
+
+    chosen = []
+    def first_cell(board):
+        cell = registry.get('ordering', 'next')(board)
+        chosen.append((cell.row, cell.col))
+        return cell
+    registry.register('ordering', 'first_cell', first_cell)
+    try:
+        assert solve_puzzle(deepcopy(MEDIUM), 'ac3',
+                            ordering='first_cell')[0] == 'solved'
+        assert chosen
+    finally:
+        del registry.ORDERINGS['first_cell']
+
+
+def test_value_orderings():
+    """Test the ascending and least-constraining-value orderings"""
+    board = Board(4)
+    for (row, col), values in {(0, 0): [1, 2, 4], (0, 1): [1, 2],
+                               (1, 0): [2, 3], (2, 0): [1, 3],
+                               (3, 0): [3]}.items():
+        board.set_domain(row * 4 + col, values_to_mask(values))
+    assert get_ascending_values(board[0][0], board) == [1, 2, 4]
+    # .. Peers with 1: (0, 1), (2, 0) and (0, 2), (0, 3), (1, 1), which
+    #    still have every value; with 2: (0, 1), (1, 0) and the same three;
+    #    with 4: only the three. (3, 0) is assigned, so not counted.
+    assert get_least_constraining_values(board[0][0], board) == [4, 1, 2]
+    for idx in (2, 3, 5):
+        board.set_domain(idx, values_to_mask([1, 2]))
+    assert get_least_constraining_values(board[0][0], board) == [4, 1, 2]
+    board.set_domain(1, values_to_mask([4, 3]))
+    board.set_domain(4, values_to_mask([4, 3]))
+    board.set_domain(8, values_to_mask([4, 3]))
+    assert get_least_constraining_values(board[0][0], board) == [1, 2, 4]
+
+    for order in ('ascending', 'lcv'):
+        stats = SolverStats()
+        grid, success = solve(deepcopy(MEDIUM), NullBoard(), stats=stats,
+                              order=order)
+        assert success and stats.nodes > 0
+
+    # .. The default order is that of the domain set, not ascending; pin it
+    #    on a puzzle with many solutions, where the order picks the one found
+    puzzle = deepcopy(MEDIUM)
+    for row in range(3, 9):
+        puzzle[row] = [0] * 9
+    found = {}
+    for order in ('domain', 'ascending'):
+        stats = SolverStats()
+        grid, success = solve(deepcopy(puzzle), NullBoard(), stats=stats,
+                              order=order)
+        assert success and stats.nodes == 45
+        found[order] = grid[8]
+    assert found['domain'] == [7, 9, 1, 5, 2, 4, 6, 8, 3]
+    assert found['ascending'] == [8, 9, 7, 6, 1, 3, 4, 2, 5]
+    with open(os.path.join(os.path.dirname(__file__), 'puzzles',
+                           'puzzle1.puzz')) as puzzlefile:
+        puzzle = next(read_puzzles(puzzlefile))
+    stats = SolverStats()
+    assert solve(puzzle, NullBoard(), stats=stats)[1]
+    assert stats.nodes == 920
+
+
+def test_solve_cache(tmp_path):
+    """Test that a disguised puzzle hits the cache, and the LRU and store"""
+    with open(os.path.join(os.path.dirname(__file__), 'puzzles',
+                           'hard.puzz')) as puzzlefile:
+        hard = next(read_puzzles(puzzlefile))
+    line, transform = canonical_form(hard)
+    assert transform_grid(hard, transform) == line_to_grid(line)
+    assert untransform_grid(line_to_grid(line), transform) == hard
+
+    # .. Swap the first two bands, two columns in a stack, relabel 1 <-> 2,
+    #    and transpose
+    relabel = {1: 2, 2: 1}
+    disguised = [[relabel.get(val, val) for val in row]
+                 for row in hard[3:6] + hard[0:3] + hard[6:]]
+    disguised = [list(col) for col in zip(*disguised)]
+    disguised[6], disguised[8] = disguised[8], disguised[6]
+    assert canonical_form(disguised)[0] == line
+
+    cache = SolveCache(maxsize=2, path=str(tmp_path / 'solutions'))
+    solution, success = cache.solve(hard)
+    assert success and cache.info().misses == 1
+    grid, success = cache.solve(disguised)
+    assert success and cache.info().hits == 1
+    assert all(val == grid[irow][icol] for irow, row in enumerate(disguised)
+               for icol, val in enumerate(row) if val)
+    assert solver.count_solutions(grid) == 1
+    assert cache.solve(hard) == (solution, True)
+
+    cache.solve(deepcopy(MEDIUM))
+    cache.solve(line_to_grid('1' * 81))
+    assert cache.info().currsize == 2
+    assert cache.solve(line_to_grid('1' * 81))[1] is False
+    cache.close()
+
+    with SolveCache(path=str(tmp_path / 'solutions')) as cache:
+        assert cache.solve(disguised) == (grid, True)
+        assert cache.info() == (1, 0, 10000, 1)
+
+
+def test_limits():
+    """Test giving up at a node budget, a deadline or when cancelled"""
+    with open(os.path.join(os.path.dirname(__file__), 'puzzles',
+                           'hard.puzz')) as puzzlefile:
+        hard = next(read_puzzles(puzzlefile))
+
+    stats = SolverStats()
+    with pytest.raises(GaveUp) as info:
+        solve(deepcopy(hard), NullBoard(), stats=stats,
+              limits=Limits(max_nodes=10))
+    assert info.value.reason == 'nodes' and stats.nodes == 10
+    assert all(info.value.grid[irow][icol] == val
+               for irow, row in enumerate(hard)
+               for icol, val in enumerate(row) if val)
+
+    stats = SolverStats()
+    with pytest.raises(GaveUp) as info:
+        backtracker(deepcopy(hard), NullBoard(), stats, Limits(seconds=0))
+    assert info.value.reason == 'timeout' and stats.nodes > 0
+
+    cancel = threading.Event()
+    cancel.set()
+    with pytest.raises(GaveUp) as info:
+        registry.solve_with(deepcopy(hard), 'dlx',
+                            limits=Limits(cancel=cancel))
+    assert info.value.reason == 'cancelled'
+    with pytest.raises(ValueError):
+        GaveUp('bored', [])
+
+    # .. The clock starts again for each solve
+    limits = Limits(seconds=60, max_nodes=100000)
+    assert solve(deepcopy(hard), NullBoard(), limits=limits)[1]
+    assert dancing_links(deepcopy(hard), NullBoard(), limits=limits)[1]
+    assert limits.reason is None
+
+    status, grid, seconds, stats = solve_puzzle(deepcopy(hard), 'backtrack',
+                                                limits=Limits(max_nodes=5))
+    assert status == 'gave_up' and stats.nodes == 5
+    results = list(solve_parallel([hard, MEDIUM], 'backtrack', workers=2,
+                                  chunksize=1, seconds=0))
+    assert [line.split('\t')[1] for line in results] == ['gave_up'] * 2
+
+    cancel = multiprocessing.Event()
+    cancel.set()
+    assert list(solve_parallel([hard], workers=2, cancel=cancel)) == []
+
+    # .. Once cancelled, the rest of a lazy input is not read
+    cancel = multiprocessing.Event()
+    pulled = []
+
+    def puzzles():
+        for index in range(1000):
+            pulled.append(index)
+            if index == 3:
+                cancel.set()
+            yield deepcopy(MEDIUM)
+
+    list(solve_parallel(puzzles(), workers=2, chunksize=1, cancel=cancel))
+    assert len(pulled) <= 5
+
+
+def test_streaming_io(tmp_path):
+    """Test per-record errors, fixed-width records, gzip and the writer"""
+    line = grid_to_line(MEDIUM)
+    lines = ['1 3 2\n', '1 x 9\n', '\n', line + '\n', line[:80] + '\n',
+             'a b\n', '1 3 2\n', '10 1 1\n', '\n', line + '\n']
+    records = list(read_records(lines))
+    assert [record.number for record in records] == [1, 2, 3, 4, 5, 6]
+    assert [record.lineno for record in records] == [1, 4, 5, 6, 7, 10]
+    assert [record.grid is None for record in records] == [True, False, True,
+                                                           True, False, False]
+    assert 'line 2' in records[0].error and 'Line 5' in records[2].error
+    assert records[4].grid[9][0] == 1 and len(records[4].grid) == 16
+    with pytest.raises(ValueError):
+        list(read_puzzles(lines))
+
+    text = line + line + '\n' + line.replace('.', '0') + '\n' + line[:40]
+    records = list(read_fixed_width(StringIO(text), 81))
+    assert [record.grid for record in records[:3]] == [MEDIUM] * 3
+    assert records[3].grid is None and 'only 40' in records[3].error
+
+    for name in ('puzzles.txt', 'puzzles.txt.gz'):
+        filename = str(tmp_path / name)
+        with open_puzzle_file(filename, 'w') as outfile:
+            assert write_puzzles(outfile, [MEDIUM, MEDIUM], 'line') == 2
+            write_puzzles(outfile, [MEDIUM], 'puzz')
+            outfile.write('bad line\n')
+        with open(filename, 'rb') as infile:
+            assert (infile.read(2) == b'\x1f\x8b') == name.endswith('.gz')
+        with open_puzzle_file(filename) as infile:
+            assert [record.grid for record in read_records(infile)] \
+                == [MEDIUM] * 3 + [None]
+
+        errors = StringIO()
+        results = list(solve_all(read_files([filename], errors=errors)))
+        assert [result.split('\t')[1] for result in results] \
+            == ['solved'] * 3 + ['malformed']
+        assert errors.getvalue().startswith(filename + ': Cannot read')
+
+
+def test_corpus(tmp_path, capsys):
+    """Test writing a binary corpus and reading it back by index and slice"""
+    filename = str(tmp_path / 'puzzles.sdk')
+    solved, success = dancing_links(deepcopy(MEDIUM), NullBoard())
+    empty = [[0] * 9 for irow in range(9)]
+    assert write_corpus(filename, [MEDIUM, empty, solved],
+                        [solved, solved, solved]) == 3
+    assert is_corpus(filename)
+    assert os.path.getsize(filename) == 16 + 3 * 2 * 41
+    with Corpus(filename) as corpus:
+        assert len(corpus) == 3 and corpus.nside == 9
+        assert corpus[0] == MEDIUM and corpus[-2] == empty
+        assert corpus[1:] == [empty, solved] and list(corpus)[2] == solved
+        assert corpus.solution(0) == solved
+        with pytest.raises(IndexError):
+            corpus[3]
+    assert list(read_files([filename])) == [MEDIUM, empty, solved]
+
+    with open(os.path.join(os.path.dirname(__file__), 'puzzles',
+                           'sixteen.puzz')) as puzzlefile:
+        sixteen = next(read_puzzles(puzzlefile))
+    write_corpus(filename, iter([sixteen]))
+    with Corpus(filename) as corpus:
+        assert corpus.cell_bits == 8 and corpus[:] == [sixteen]
+        with pytest.raises(ValueError):
+            corpus.solution(0)
+    with pytest.raises(ValueError):
+        write_corpus(filename, [MEDIUM, sixteen])
+    with pytest.raises(ValueError):
+        write_corpus(filename, [MEDIUM], [])
+
+    with open(filename, 'wb') as outfile:
+        outfile.write(b'SDKC\x01\x09\x04\x00' + bytes([5]) + bytes(7))
+    with pytest.raises(ValueError):
+        Corpus(filename)
+    assert not is_corpus(os.path.join(os.path.dirname(__file__), 'puzzles',
+                                      'medium.puzz'))
+
+    # .. Puzzles with no solution are left out when solving
+    bad = deepcopy(MEDIUM)
+    bad[0] = [5] * 9
+    textfile = str(tmp_path / 'puzzles.txt')
+    with open(textfile, 'w') as outfile:
+        outfile.write('\n'.join(grid_to_line(grid)
+                                for grid in [MEDIUM, bad, empty]) + '\n')
+    corpus_main([textfile, '--output', filename, '--solve'])
+    assert 'puzzle 2 has no solution' in capsys.readouterr().err
+    with Corpus(filename) as corpus:
+        assert corpus[:] == [MEDIUM, empty]
+        assert all(sorted(row) == list(range(1, 10))
+                   for index in range(2) for row in corpus.solution(index))
+
+
+def test_validate_grids(tmp_path):
+    """Test checking many solved boards at once with NumPy"""
+    np = pytest.importorskip('numpy')
+    from vectorized import read_corpus_array, unit_name, validate_grids
+
+    solved, success = dancing_links(deepcopy(MEDIUM), NullBoard())
+    swapped = deepcopy(solved)                  # Columns 0 and 1 break
+    swapped[0][0], swapped[0][1] = swapped[0][1], swapped[0][0]
+    empty_cell = deepcopy(solved)
+    empty_cell[4][4] = 0
+    too_big = deepcopy(solved)
+    too_big[8][8] = 10
+    latin = [[(row + col) % 9 + 1 for col in range(9)]  # Only boxes break
+             for row in range(9)]
+    grids = [solved, swapped, empty_cell, too_big, latin]
+    valid, first = validate_grids(np.array(grids, dtype=np.int8))
+    assert valid.tolist() == [True, False, False, False, False]
+    assert first.tolist() == [-1, 9, 4, 8, 18]
+    assert [unit_name(unit) for unit in first[1:]] == ['column 0', 'row 4',
+                                                       'row 8', 'box 0']
+    assert validate_grids(solved)[0].tolist() == [True]
+    assert len(validate_grids(np.zeros((0, 9, 9), dtype=int))[0]) == 0
+    with pytest.raises(ValueError):
+        validate_grids(np.zeros((2, 9, 8), dtype=int))
+
+    with open(os.path.join(os.path.dirname(__file__), 'puzzles',
+                           'sixteen.puzz')) as puzzlefile:
+        sixteen = next(read_puzzles(puzzlefile))
+    sixteen, success = dancing_links(sixteen, NullBoard())
+    valid, first = validate_grids([sixteen, sixteen[1:] + sixteen[:1]])
+    assert valid.tolist() == [True, False] and first[1] == 32
+
+    filename = str(tmp_path / 'puzzles.sdk')
+    write_corpus(filename, [MEDIUM, swapped], [solved, swapped])
+    with Corpus(filename) as corpus:
+        assert read_corpus_array(corpus).tolist() == [MEDIUM, swapped]
+        solutions = read_corpus_array(corpus, 1, solutions=True)
+        assert solutions.shape == (1, 9, 9)
+        assert validate_grids(solutions)[0].tolist() == [False]
+        assert read_corpus_array(corpus, 2).shape == (0, 9, 9)
+
+
+def test_propagate_batch():
+    """Test naked and hidden singles on many boards at once"""
+    np = pytest.importorskip('numpy')
+    import vectorized
+    from vectorized import INVALID, SOLVED, STUCK, propagate, solve_batch
+
+    puzzles = {}
+    for level in ('easy', 'hard'):
+        with open(os.path.join(os.path.dirname(__file__), 'puzzles',
+                               level + '.puzz')) as puzzlefile:
+            puzzles[level] = next(read_puzzles(puzzlefile))
+    duplicate = deepcopy(puzzles['easy'])
+    col = duplicate[0].index(0)
+    duplicate[0][col] = max(duplicate[0])
+    grids = [puzzles['easy'], puzzles['hard'], duplicate, MEDIUM]
+
+    placed, status = propagate(grids)
+    assert status.tolist() == [SOLVED, STUCK, INVALID, STUCK]
+    expected = solve(deepcopy(puzzles['easy']), NullBoard())[0]
+    assert placed[0].tolist() == expected
+    # .. Propagation keeps the givens and only places values
+    assert all((placed[1][np.array(puzzles['hard']) > 0]
+                == np.array(puzzles['hard'])[np.array(puzzles['hard']) > 0]))
+    assert (placed[1] > 0).sum() > (np.array(puzzles['hard']) > 0).sum()
+
+    stats = SolverStats()
+    solutions, success, searched = solve_batch(grids, 'dlx', stats)
+    assert success.tolist() == [True, True, False, True]
+    assert searched.tolist() == [False, True, False, True]
+    assert solutions[2].tolist() == duplicate and stats.nodes > 0
+    assert solutions[1].tolist() == solve(deepcopy(puzzles['hard']),
+                                          NullBoard())[0]
+    assert vectorized.validate_grids(solutions[success])[0].all()
+
+    # .. A medium puzzle needs hidden singles, which AC-3 alone lacks
+    medium = line_to_grid(next(generate(1, 'medium', seed=5)))
+    assert grade(medium) == 'medium'
+    placed, status = propagate(np.array([medium] * 3, dtype=np.uint8))
+    assert status.tolist() == [SOLVED] * 3
+    assert placed[2].tolist() == solve(medium, NullBoard())[0]
+    with pytest.raises(ValueError):
+        propagate([[[10] * 9] * 9])
@@ -11,28 +11,145 @@ By Penny Rowe
 AI with Prof. America Chambers, Spring 2021
 Based on Variable.java
 
+Domains are stored as bitmasks: bit v-1 is set if the value v is in the
+domain, so {1, 2, 9} is 0b100000011. A whole board is one flat list of
+these integers (see Board), and Variable is a view onto one entry of it.
 """
 
+try:
+    popcount = int.bit_count
+except AttributeError:                  # Python < 3.10
+    def popcount(mask):
+        """
+        Number of bits set in mask
+        @param mask  Domain bitmask, int
+        @return  Number of values in the domain
+        """
+        return bin(mask).count('1')
+
+
+def value_to_bit(value):
+    """
+    Get the bitmask for a single value
+    @param value  The value, 1...nside
+    @return  The bitmask with only the bit for value set
+    """
+    return 1 << (value - 1)
+
+
+def values_to_mask(values):
+    """
+    Get the bitmask for a collection of values
+    @param values  Collection of values, each 1...nside
+    @return  The domain bitmask
+    """
+    mask = 0
+    for value in values:
+        mask |= 1 << (value - 1)
+    return mask
+
+
+def mask_to_values(mask):
+    """
+    Get the values in a domain bitmask, in ascending order
+    @param mask  The domain bitmask
+    @return  List of values
+    """
+    values = []
+    while mask:
+        lowbit = mask & -mask
+        values.append(lowbit.bit_length())
+        mask ^= lowbit
+    return values
+
+
+def lowest_value(mask):
+    """
+    Get the smallest value in a domain bitmask (the only value, if the
+    domain has size one)
+    @param mask  The domain bitmask
+    @return  The smallest value in the domain, or 0 if the domain is empty
+    """
+    return (mask & -mask).bit_length()
+
+
 
 class Variable:
     """
-    A variable in a Sudoku CSP with domain {1, 2, 3, ..., 9}
+    A variable in a Sudoku CSP with domain {1, 2, 3, ..., nside}
     The value of the variable may be fixed by the original problem.
+    The domain lives in a bitmask list that may be shared with a Board, in
+    which case the variable is a view onto one cell of the board.
     """
-    def __init__(self, row, col, nside, val={1, 2, 3, 4, 5, 6, 7, 8, 9},
-                 fix=False):
+    def __init__(self, row, col, nside, val=None, fix=False):
         """
         Create a new variable with the domain specified.
             domain may be:
-                - {1...9}
-                - a single value
+                - None, for {1...nside}
                 - a collection
         """
+        if val is None:
+            val = range(1, nside + 1)
         self.row = row
         self.col = col
-        self.fixed = fix
         self.max_domain_val = nside
-        self.domain = val.copy()
+        self._board = None
+        self._domains = [values_to_mask(val)]
+        self._fixed = bytearray([fix])
+        self._index = 0
+
+
+    @classmethod
+    def view(cls, board, row, col):
+        """
+        Create a variable that reads and writes its domain in the board
+        @param board  The Board the variable belongs to
+        @param row  Index to row
+        @param col  Index to column
+        @return  The Variable
+        """
+        var = cls.__new__(cls)
+        var.row = row
+        var.col = col
+        var.max_domain_val = board.nside
+        var._board = board
+        var._domains = board.domains
+        var._fixed = board.fixed
+        var._index = row * board.nside + col
+        return var
+
+
+    @property
+    def fixed(self):
+        """True if the domain is fixed by the original problem"""
+        return bool(self._fixed[self._index])
+
+
+    @property
+    def domain(self):
+        """
+        The domain of the variable, as a new set each time it is read;
+        changing the set does not change the domain
+        """
+        return set(mask_to_values(self._domains[self._index]))
+
+
+    @property
+    def mask(self):
+        """The domain of the variable, as a bitmask"""
+        return self._domains[self._index]
+
+
+    def _set_mask(self, mask):
+        """
+        Set the domain bitmask, through the board if this is a view, so that
+        the change is trailed and watched
+        @param mask  The new domain bitmask
+        """
+        if self._board is not None:
+            self._board.set_domain(self._index, mask)
+        else:
+            self._domains[self._index] = mask
 
 
     def replace(self, value):
@@ -41,9 +158,9 @@ class Variable:
          @param val  The value to be added
          @throws IllegalStateException  The domain is fixed
          """
-        if self.fixed:
+        if self._fixed[self._index]:
             raise ValueError('The domain is fixed; cannot replace value.')
-        self.domain = {value}
+        self._set_mask(1 << (value - 1))
 
 
     def add(self, value):
@@ -52,9 +169,9 @@ class Variable:
         	 @param val  The value to be added
         	 @throws IllegalStateException The domain is fixed
         """
-        if self.fixed:
+        if self._fixed[self._index]:
             raise ValueError('The domain is fixed; cannot add value.')
-        self.domain.add(value)
+        self._set_mask(self._domains[self._index] | 1 << (value - 1))
 
 
     def add_all(self, collection):
@@ -63,9 +180,9 @@ class Variable:
         	@param input		A collection of integer values to be added
         	@throws IllegalStateException  The domain is fixed
         """
-        if self.fixed:
+        if self._fixed[self._index]:
             raise ValueError('The domain is fixed; cannot add collection.')
-        self.domain.union(collection)
+        self._set_mask(self._domains[self._index] | values_to_mask(collection))
 
 
     def remove(self, val):
@@ -73,11 +190,15 @@ class Variable:
         	Removes a value from the domain
         	@param val  The value to be removed
         	@throws IllegalStateException  The domain is fixed
-        @returns: False
+        @throws KeyError  The value is not in the domain
         """
-        if self.fixed:
+        if self._fixed[self._index]:
             raise ValueError('The domain is fixed; cannot remove value.')
-        self.domain.remove(val)
+        bit = 1 << (val - 1)
+        mask = self._domains[self._index]
+        if not mask & bit:
+            raise KeyError(val)
+        self._set_mask(mask ^ bit)
 
     def clear(self):
         """
@@ -88,15 +209,18 @@ class Variable:
         	# 			The domain is fixed
         	#
         """
-        if self.fixed:
+        if self._fixed[self._index]:
             raise ValueError('The domain is fixed; cannot clear values.')
-        self.domain = {}
+        self._set_mask(0)
 
 
     def get_domain(self):
         """
-        Returns the domain of the variable
-        @return The domain of the variable
+        Returns the domain of the variable. The domain is stored as a
+        bitmask, so this builds a new set on each call, and changing it does
+        not change the domain (use add, remove or replace); the solvers use
+        the mask property instead
+        @return The domain of the variable, a set
         """
         return self.domain
 
@@ -106,7 +230,7 @@ class Variable:
         Returns the size of the variable's domain
         @return The size of the variable's domain
         """
-        return len(self.domain)
+        return popcount(self._domains[self._index])
 
 
     def get_only_value(self):
@@ -115,10 +239,11 @@ class Variable:
         @throws IllegalStateException The domain has more than 1 value or is empty
         @return The only value in the variable's domain
         """
-        if self.get_domain_size() != 1:
+        mask = self._domains[self._index]
+        if not mask or mask & (mask - 1):
             raise ValueError('Domain of one expected, but was 0 or > 1')
 
-        return next(iter(self.domain))
+        return mask.bit_length()
 
 
     #def isfixed(self):
@@ -134,4 +259,166 @@ class Variable:
         @param value The value to be checked
         @return True if the domain contains the value, false otherwise
         """
-        return value in self.domain
+        return bool(self._domains[self._index] & (1 << (value - 1)))
+
+
+
+class Board:
+    """
+    A Sudoku board, stored as one domain bitmask per cell in a flat list
+    indexed by row * nside + col, plus a flag per cell for fixed values.
+    Indexing the board by row gives a list of Variable views, so
+    board[row][col] works as it did for a list of lists of Variables.
+    Copying a board only copies the two flat arrays.
+
+    Changes can instead be undone: after start_trail, every change made
+    through a Variable view records the cell's old domain on the trail,
+    and undo(mark) rolls the board back to an earlier mark().
+
+    A watcher, if set, is told about every change made with set_domain or
+    undo, by a call to watcher.domain_changed(idx, old_mask, new_mask).
+
+    arc_queued is the scratch space of solver.arc_consistency3, made on its
+    first call and shared by copies of the board; it is all zeros between
+    calls.
+    """
+    def __init__(self, nside=9):
+        """
+        Create a board where every cell may take any value
+        @param nside  Elements in a side of the board; default 9
+        """
+        self.nside = nside
+        self.ncells = nside * nside
+        self.full_mask = (1 << nside) - 1
+        self.domains = [self.full_mask] * self.ncells
+        self.fixed = bytearray(self.ncells)
+        self.trail = None
+        self.watcher = None
+        self.arc_queued = None
+        self._rows = None
+
+
+    def fix(self, row, col, value):
+        """
+        Fix the value of a cell, as given by the original problem
+        @param row  Index to row
+        @param col  Index to column
+        @param value  The value, 1...nside
+        """
+        idx = row * self.nside + col
+        self.domains[idx] = 1 << (value - 1)
+        self.fixed[idx] = 1
+
+
+    def copy(self):
+        """
+        Copy the board
+        @return  A new Board with the same domains
+        """
+        new = Board.__new__(Board)
+        new.nside = self.nside
+        new.ncells = self.ncells
+        new.full_mask = self.full_mask
+        new.domains = self.domains[:]
+        new.fixed = self.fixed[:]
+        new.trail = None
+        new.watcher = None
+        new.arc_queued = self.arc_queued
+        new._rows = None
+        return new
+
+
+    def set_domain(self, idx, mask):
+        """
+        Set the domain of a cell, recording the old one if keeping a trail
+        @param idx  Index to the cell, row * nside + col
+        @param mask  The new domain bitmask
+        """
+        old = self.domains[idx]
+        if self.trail is not None:
+            self.trail.append((idx, old))
+        self.domains[idx] = mask
+        if self.watcher is not None:
+            self.watcher.domain_changed(idx, old, mask)
+
+
+    def start_trail(self):
+        """Start recording changes to the domains, so they can be undone"""
+        self.trail = []
+
+
+    def mark(self):
+        """
+        Mark the current state of the board
+        @return  The mark, to pass to undo
+        """
+        return len(self.trail)
+
+
+    def undo(self, mark):
+        """
+        Undo all changes to the domains made since the mark
+        @param mark  The mark, from mark()
+        """
+        trail = self.trail
+        domains = self.domains
+        watcher = self.watcher
+        while len(trail) > mark:
+            idx, mask = trail.pop()
+            if watcher is not None:
+                watcher.domain_changed(idx, domains[idx], mask)
+            domains[idx] = mask
+
+
+    def __deepcopy__(self, memo):
+        return self.copy()
+
+
+    def __len__(self):
+        return self.nside
+
+
+    def __getitem__(self, row):
+        if self._rows is None:
+            self._rows = [[Variable.view(self, irow, icol)
+                           for icol in range(self.nside)]
+                          for irow in range(self.nside)]
+        return self._rows[row]
+
+
+    def __iter__(self):
+        for row in range(self.nside):
+            yield self[row]
+
+
+    def is_complete(self):
+        """
+        Check if each cell has only one value. Consistency is not checked.
+        @return True if the board is complete, False otherwise
+        """
+        for mask in self.domains:
+            if mask & (mask - 1):
+                return False
+        return True
+
+
+    def get_grid(self):
+        """
+        Get the numbers in the board
+        @return  List of lists of int: the value of each cell with a single
+                 value, 0 for cells with more than one value and -1 for
+                 cells with an empty domain
+        """
+        nside = self.nside
+        grid = []
+        for start in range(0, self.ncells, nside):
+            gridrow = []
+            for mask in self.domains[start:start + nside]:
+                if not mask:
+                    gridrow.append(-1)
+                elif mask & (mask - 1):
+                    gridrow.append(0)
+                else:
+                    gridrow.append(mask.bit_length())
+            grid.append(gridrow)
+        return grid
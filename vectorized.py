@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 21:14:52 2026
+
+Checks and propagation over many boards at once, with NumPy, for bulk
+runs: the boards are stacked in an (N, nside, nside) array and every row,
+column and box of all of them is handled with array operations instead of
+Python loops.
+
+propagate keeps the candidates of every cell of every board as bitmasks,
+in an (N, nside * nside) array, and applies naked singles (a value placed
+in a cell is removed from its peers) and hidden singles (a value with only
+one place left in a unit goes there) to all the boards until none of them
+changes. solve_batch then hands only the boards that are not yet solved
+to a per-board engine. Both rules only ever place values, so a board is
+handed over as a grid with the values placed so far, and the engine
+starts from the same candidates.
+
+This module needs numpy. The solvers do not import it, so they still run
+with only the standard library.
+
+The units of a board are numbered as in the results of validate_grids:
+the rows 0 to nside - 1, then the columns, then the boxes, left to right
+and top to bottom; unit_name turns the number into words.
+"""
+
+from functools import lru_cache
+from math import isqrt
+
+import numpy as np
+
+from board_plotter import NullBoard
+from corpus import HEADER
+from registry import get
+
+
+CHUNK = 1 << 16         # Boards handled at a time, so memory stays bounded
+UNIT_KINDS = ('row', 'column', 'box')
+
+# Status of each board after propagate
+INVALID = -1            # A contradiction: a value twice in a unit, a cell
+                        # with no candidates or a value with no place
+STUCK = 0               # The rules place no more values
+SOLVED = 1
+
+
+
+def unit_name(unit, nside=9):
+    """
+    Describe a unit, numbered as by validate_grids
+    @param unit  Number of the unit, from 0 to 3 * nside - 1
+    @param nside  Elements in a side of the board
+    @return  E.g. 'row 0', 'column 8' or 'box 4'
+    """
+    kind, index = divmod(int(unit), nside)
+    return UNIT_KINDS[kind] + ' ' + str(index)
+
+
+
+def get_stack(grids):
+    """
+    Get boards as an (N, nside, nside) array
+    @param grids  Array-like of boards, (N, nside, nside), or one board
+    @return  The array, and nside
+    @raises ValueError  If the boards are not square, with square boxes
+    """
+    grids = np.asarray(grids)
+    if grids.ndim == 2:
+        grids = grids[np.newaxis]
+    nside = grids.shape[-1]
+    if grids.ndim != 3 or grids.shape[1] != nside \
+      or isqrt(nside) ** 2 != nside:
+        raise ValueError('Expected an (N, nside, nside) array, with nside '
+                         'a square number; got ' + str(grids.shape))
+    return grids, nside
+
+
+
+def get_unit_masks(bits, nside):
+    """
+    Combine the bits of the cells of each unit
+    @param bits  (N, nside, nside) array of the bit of each cell's value
+    @param nside  Elements in a side of the board
+    @return  (N, 3 * nside) array of the OR of the bits in each row, column
+             and box, in unit order
+    """
+    nbox = isqrt(nside)
+    rows = np.bitwise_or.reduce(bits, axis=2)
+    cols = np.bitwise_or.reduce(bits, axis=1)
+
+    # .. Axes: board, band, row in band, stack, column in stack
+    boxes = bits.reshape(len(bits), nbox, nbox, nbox, nbox)
+    boxes = np.bitwise_or.reduce(np.bitwise_or.reduce(boxes, axis=4), axis=2)
+    return np.concatenate([rows, cols, boxes.reshape(len(bits), nside)],
+                          axis=1)
+
+
+
+def validate_grids(grids):
+    """
+    Check that solved boards are valid: every row, column and box holds
+    each value from 1 to nside once. A unit has nside cells, so it does if
+    every cell is in range and their values together cover 1 to nside;
+    each cell's value is turned into a bit and the bits of each unit ORed.
+    @param grids  Array-like of solved boards, (N, nside, nside), e.g.
+                  (N, 9, 9), of integers
+    @return valid  (N,) array of bool, True for a valid board
+    @return first  (N,) array of the first unit of each board that breaks
+                   the rules (see unit_name), or -1 for a valid board
+    @raises ValueError  If the boards are not square, with square boxes
+    """
+    grids, nside = get_stack(grids)
+    dtype = np.uint16 if nside <= 16 else np.uint32
+    full = (1 << nside) - 1
+
+    valid = np.empty(len(grids), dtype=bool)
+    first = np.empty(len(grids), dtype=np.intp)
+    for start in range(0, len(grids), CHUNK):
+        chunk = grids[start:start + CHUNK]
+        in_range = (chunk >= 1) & (chunk <= nside)
+        shift = np.where(in_range, chunk - 1, 0).astype(dtype)
+        bits = np.where(in_range, np.left_shift(dtype(1), shift), 0)
+        unit_ok = get_unit_masks(bits.astype(dtype), nside) == full
+
+        ok = unit_ok.all(axis=1)
+        valid[start:start + CHUNK] = ok
+        first[start:start + CHUNK] = np.where(ok, -1,
+                                              np.argmin(unit_ok, axis=1))
+    return valid, first
+
+
+
+def read_corpus_array(corpus, start=0, stop=None, solutions=False):
+    """
+    Read boards from a binary corpus (see corpus.py) straight into an array,
+    without decoding them one at a time
+    @param corpus  An open corpus.Corpus
+    @param start  Index of the first board
+    @param stop  Index after the last board; default the end
+    @param solutions  If True, read the stored solutions instead of the
+                      puzzles
+    @return  (N, nside, nside) array of uint8, with 0 for empty cells
+    @raises ValueError  If solutions is True and the corpus has none
+    """
+    if solutions and not corpus.has_solutions:
+        raise ValueError(corpus.filename + ' has no solutions')
+    start, stop, step = slice(start, stop).indices(len(corpus))
+    nside = corpus.nside
+    count = max(stop - start, 0)
+    if not count:
+        return np.zeros((0, nside, nside), dtype=np.uint8)
+
+    records = np.frombuffer(corpus.map, dtype=np.uint8,
+                            count=count * corpus.stride,
+                            offset=HEADER.size + start * corpus.stride)
+    records = records.reshape(count, corpus.stride)
+    offset = corpus.record_size if solutions else 0
+    records = records[:, offset:offset + corpus.record_size]
+    if corpus.cell_bits == 8:
+        cells = records.copy()              # Not a view of the mapped file
+    else:
+        cells = np.empty((count, 2 * corpus.record_size), dtype=np.uint8)
+        cells[:, 0::2] = records >> 4
+        cells[:, 1::2] = records & 15
+    return cells[:, :nside * nside].reshape(count, nside, nside)
+
+
+
+@lru_cache(maxsize=None)
+def get_units(nside):
+    """
+    Get the cells of every unit
+    @param nside  Elements in a side of the board
+    @return  (3, nside, nside) array: [kind, unit, k] is the index of the
+             k'th cell of the unit of that kind (row, column, box). Each
+             kind covers every cell once.
+    """
+    nbox = isqrt(nside)
+    cells = np.arange(nside * nside).reshape(nside, nside)
+    boxes = cells.reshape(nbox, nbox, nbox, nbox).transpose(0, 2, 1, 3)
+    units = np.stack([cells, cells.T, boxes.reshape(nside, nside)])
+    units.flags.writeable = False
+    return units
+
+
+
+def get_candidates(grids, nside):
+    """
+    Get the candidates of every cell
+    @param grids  (N, nside, nside) array of integers, 0 for empty cells
+    @param nside  Elements in a side of the board
+    @return  (N, nside * nside) array of bitmasks: bit v - 1 for value v
+    @raises ValueError  If a value is out of range
+    """
+    dtype = np.uint16 if nside <= 16 else np.uint32
+    values = grids.reshape(len(grids), nside * nside).astype(np.int64)
+    if values.size and (values.min() < 0 or values.max() > nside):
+        raise ValueError('Values must be from 0 to ' + str(nside))
+    full = dtype((1 << nside) - 1)
+    bits = np.left_shift(1, np.maximum(values - 1, 0)).astype(dtype)
+    return np.where(values > 0, bits, full)
+
+
+
+def is_single(cand):
+    """
+    @param cand  Array of bitmasks
+    @return  Array of bool, True where exactly one bit is set
+    """
+    return (cand != 0) & (cand & (cand - 1) == 0)
+
+
+
+def propagate_step(cand, nside):
+    """
+    Apply naked singles, then hidden singles, once to every board
+    @param cand  (N, nside * nside) array of candidate bitmasks
+    @param nside  Elements in a side of the board
+    @return cand  The new candidates
+    @return invalid  (N,) array of bool, True for a board with a
+                     contradiction
+    """
+    nboards = len(cand)
+    units = get_units(nside)
+    single = is_single(cand)
+    placed = np.where(single, cand, 0)
+    invalid = np.zeros(nboards, dtype=bool)
+
+    # .. Naked singles: take the values placed in each unit out of the
+    #    other cells. A unit with a value placed twice has an OR smaller
+    #    than the sum.
+    taken = np.zeros_like(cand)
+    for cells in units:
+        unit_placed = placed[:, cells]
+        unit_or = np.bitwise_or.reduce(unit_placed, axis=2)
+        invalid |= (unit_placed.sum(axis=2, dtype=np.int64) != unit_or).any(1)
+        taken[:, cells.ravel()] |= np.repeat(unit_or, nside, axis=1)
+    cand = np.where(single, cand, cand & ~taken)
+
+    # .. Hidden singles: a value with one place left in a unit goes there;
+    #    a value with none left is a contradiction
+    for val in range(nside):
+        bit = cand.dtype.type(1 << val)
+        has = (cand & bit) != 0
+        only = np.zeros_like(has)
+        for cells in units:
+            unit_has = has[:, cells]
+            count = unit_has.sum(axis=2)
+            invalid |= (count == 0).any(axis=1)
+            only[:, cells.ravel()] |= (unit_has & (count == 1)[:, :, None]
+                                       ).reshape(nboards, -1)
+        cand = np.where(only, bit, cand)
+
+    invalid |= (cand == 0).any(axis=1)
+    return cand, invalid
+
+
+
+def get_values(cand, nside):
+    """
+    Get the grids of the values placed
+    @param cand  (N, nside * nside) array of candidate bitmasks
+    @param nside  Elements in a side of the board
+    @return  (N, nside, nside) array of uint8, 0 where no value is placed
+    """
+    single = is_single(cand)
+    values = np.log2(np.where(single, cand, 1)).astype(np.uint8) + 1
+    return np.where(single, values, 0).astype(np.uint8).reshape(
+        len(cand), nside, nside)
+
+
+
+def propagate(grids):
+    """
+    Propagate naked and hidden singles on many boards at once, CHUNK
+    boards at a time. Each round works on the boards that changed in the
+    last one.
+    @param grids  Array-like of puzzles, (N, nside, nside), 0 for empty
+                  cells
+    @return grids  (N, nside, nside) array of uint8 with the values placed
+    @return status  (N,) array of SOLVED, STUCK or INVALID for each board
+    @raises ValueError  If the boards are not square, with square boxes,
+                        or a value is out of range
+    """
+    grids, nside = get_stack(grids)
+    placed = np.empty(grids.shape, dtype=np.uint8)
+    status = np.full(len(grids), STUCK, dtype=np.int8)
+
+    for start in range(0, len(grids), CHUNK):
+        cand = get_candidates(grids[start:start + CHUNK], nside)
+        chunk_status = status[start:start + CHUNK]
+        active = np.arange(len(cand))
+        while active.size:
+            before = cand[active]
+            after, invalid = propagate_step(before, nside)
+            cand[active] = after
+
+            # .. A board is done when a round finds no contradiction and
+            #    changes nothing, so a solved board is also checked
+            changed = (after != before).any(axis=1)
+            chunk_status[active[invalid]] = INVALID
+            done = ~invalid & ~changed
+            chunk_status[active[done & is_single(after).all(axis=1)]] = SOLVED
+            active = active[~invalid & changed]
+        placed[start:start + CHUNK] = get_values(cand, nside)
+
+    return placed, status
+
+
+
+def solve_batch(grids, engine='ac3', stats=None, **options):
+    """
+    Solve many puzzles: propagate on all of them at once, then solve the
+    ones that are still not solved one at a time
+    @param grids  Array-like of puzzles, (N, nside, nside), 0 for empty
+                  cells
+    @param engine  Name of the engine for the boards propagation does not
+                   solve (see registry.py)
+    @param stats  SolverStats to add the counts of the engine to, or None
+    @param options  Keyword arguments for the engine
+    @return solutions  (N, nside, nside) array of uint8: the solved grids,
+                       or the starting grid for a puzzle that is not solved
+    @return success  (N,) array of bool, True for a solved puzzle
+    @return searched  (N,) array of bool, True for a puzzle that was handed
+                      to the engine
+    @raises ValueError  As for propagate
+    """
+    grids, nside = get_stack(grids)
+    placed, status = propagate(grids)
+    solutions = np.where((status == SOLVED)[:, None, None], placed,
+                         grids).astype(np.uint8)
+    success = status == SOLVED
+    searched = status == STUCK
+
+    solver = get('engine', engine)
+    for index in np.flatnonzero(searched):
+        grid, solved = solver(placed[index].tolist(), NullBoard(),
+                              stats=stats, **options)
+        if solved:
+            solutions[index] = grid
+            success[index] = True
+    return solutions, success, searched